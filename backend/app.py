@@ -10,15 +10,27 @@ from config import (
     FLASK_SECRET_KEY, ADMIN_ROLE, VIEWER_ROLE, db,
     USERS_COLLECTION, RESOURCES_COLLECTION, SESSIONS_COLLECTION, CHAT_HISTORY_COLLECTION,
     USER_STATUS_PENDING, USER_STATUS_APPROVED, USER_STATUS_REJECTED,
-    JWT_SECRET
+    JWT_SECRET, ENSURE_INDEXES_ON_STARTUP, SESSION_REAPER_ENABLED, SESSION_REAPER_INTERVAL_SECONDS,
+    FIREBASE_STANDIN_CERTS_FILE, firebase_initialized
 )
 from services import AuthService, ResourceService, AIService, FileService
-from utils import login_required, admin_required, validate_request_data, format_response
+from utils import login_required, admin_required, validate_request_data, format_response, start_session_reaper, conditional_get
 from reports import ReportService
+from indexes import ensure_indexes
+from firebase_tokens import certificate_cache
+from mailer import email_outbox
+from suggestions import resource_suggestions
+from fuzzy_index import resource_fuzzy_index
+from user_directory import user_directory
+from write_generation import resource_generation
+from json_encoding import FastJSONProvider
+from compression import compress_response, drop_encoded_ranges
 
 
 app = Flask(__name__)
 app.secret_key = FLASK_SECRET_KEY
+# orjson-backed jsonify that also understands ObjectId, datetime and NumPy values
+app.json = FastJSONProvider(app)
 
 # Enhanced CORS configuration
 CORS(app, 
@@ -37,12 +49,41 @@ def handle_preflight():
         response.headers.add('Access-Control-Allow-Methods', "*")
         return response
 
+# gzip/brotli for clients that accept it
+app.before_request(drop_encoded_ranges)
+app.after_request(compress_response)
+
 # Initialize services
 auth_service = AuthService()
 resource_service = ResourceService()
 ai_service = AIService()
 file_service = FileService()
 
+# Bootstrap indexes (idempotent) and optionally reap expired sessions in the background
+if ENSURE_INDEXES_ON_STARTUP:
+    ensure_indexes()
+if SESSION_REAPER_ENABLED:
+    start_session_reaper(SESSION_REAPER_INTERVAL_SECONDS)
+
+# Local stand-in for Google's certificate endpoint, only registered for offline testing
+if FIREBASE_STANDIN_CERTS_FILE:
+    @app.route('/dev/firebase-certs', methods=['GET'])
+    def firebase_standin_certs():
+        response = send_file(FIREBASE_STANDIN_CERTS_FILE, mimetype='application/json')
+        response.headers['Cache-Control'] = 'public, max-age=3600'
+        return response
+
+# Build the typeahead and fuzzy search indexes in the background so first use doesn't wait on them
+resource_suggestions.rebuild_in_background()
+resource_fuzzy_index.rebuild_in_background()
+
+# Deliver queued emails in the background
+email_outbox.start_worker()
+
+# Keep Firebase signing certificates warm so logins never wait on the fetch
+if firebase_initialized:
+    certificate_cache.start_background_refresh()
+
 # Error handler
 @app.errorhandler(Exception)
 def handle_error(e):
@@ -104,6 +145,21 @@ def logout():
         app.logger.error(f"Logout error: {str(e)}")
         return format_response(error="Logout failed", status=400)
 
+@app.route('/api/auth/revoke-sessions', methods=['POST'])
+@login_required
+@admin_required
+def revoke_sessions():
+    try:
+        data = request.get_json()
+        validation_error = validate_request_data(data, ['uid'])
+        if validation_error:
+            return validation_error
+        
+        return auth_service.revoke_user_sessions(data['uid'])
+    except Exception as e:
+        app.logger.error(f"Session revocation error: {str(e)}")
+        return format_response(error="Session revocation failed", status=400)
+
 @app.route('/api/auth/profile', methods=['GET'])
 @login_required
 def get_profile():
@@ -144,8 +200,12 @@ def get_resources():
         filters = request.args.to_dict()
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 10))
+        cursor = request.args.get('cursor')
+        count_mode = request.args.get('count_mode')
+        fields = request.args.get('fields')
+        stream = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
         
-        return resource_service.get_resources(filters, page, limit)
+        return resource_service.get_resources(filters, page, limit, cursor, count_mode, fields, stream)
     except Exception as e:
         app.logger.error(f"Get resources error: {str(e)}")
         return format_response(error="Failed to fetch resources", status=400)
@@ -165,7 +225,7 @@ def create_resource():
 @login_required
 def get_resource(resource_id):
     try:
-        return resource_service.get_resource(resource_id)
+        return resource_service.get_resource(resource_id, request.args.get('fields'))
     except Exception as e:
         app.logger.error(f"Get resource error: {str(e)}")
         return format_response(error="Failed to fetch resource", status=400)
@@ -191,13 +251,45 @@ def delete_resource(resource_id):
         app.logger.error(f"Delete resource error: {str(e)}")
         return format_response(error="Failed to delete resource", status=400)
 
+@app.route('/api/resources/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_resources():
+    try:
+        data = request.get_json() or {}
+        return resource_service.bulk_resources(data.get('operations'), request)
+    except Exception as e:
+        app.logger.error(f"Bulk resources error: {str(e)}")
+        return format_response(error="Bulk operation failed", status=400)
+
+@app.route('/api/resources/batch-get', methods=['POST'])
+@login_required
+def batch_get_resources():
+    try:
+        data = request.get_json() or {}
+        return resource_service.get_resources_by_ids(data.get('ids'), data.get('fields') or request.args.get('fields'))
+    except Exception as e:
+        app.logger.error(f"Batch get resources error: {str(e)}")
+        return format_response(error="Failed to fetch resources", status=400)
+
+@app.route('/api/resources/suggest', methods=['GET'])
+@login_required
+def suggest_resources():
+    try:
+        prefix = request.args.get('q', '')
+        limit = int(request.args.get('limit', 10))
+        return resource_service.suggest_resources(prefix, limit)
+    except Exception as e:
+        app.logger.error(f"Suggest resources error: {str(e)}")
+        return format_response(error="Suggestions failed", status=400)
+
 @app.route('/api/resources/search', methods=['GET'])
 @login_required
 def search_resources():
     try:
         query = request.args.get('q', '')
         filters = request.args.to_dict()
-        return resource_service.search_resources(query, filters)
+        return resource_service.search_resources(query, filters, request.args.get('fields'))
     except Exception as e:
         app.logger.error(f"Search resources error: {str(e)}")
         return format_response(error="Search failed", status=400)
@@ -206,6 +298,7 @@ def search_resources():
 
 @app.route('/api/filter-options', methods=['GET'])
 @login_required
+@conditional_get(resource_generation)
 def get_filter_options():
     """Get all filter options for enhanced filtering"""
     try:
@@ -220,12 +313,14 @@ def get_filter_options():
 
 @app.route('/api/departments', methods=['GET'])
 @login_required
+@conditional_get(resource_generation)
 def get_departments():
     """Get unique departments"""
     return resource_service.get_unique_values('department')
 
 @app.route('/api/locations', methods=['GET'])
 @login_required
+@conditional_get(resource_generation)
 def get_locations():
     """Get unique locations"""
     return resource_service.get_unique_values('location')
@@ -304,6 +399,7 @@ def is_valid_cost(cost):
     return False
 
 @app.route('/api/resources/stats', methods=['GET'])
+@conditional_get(resource_generation)
 def get_resource_stats():
     """
     Get resource statistics, now including parent department stats.
@@ -347,52 +443,16 @@ def get_resource_stats():
         section_stats = list(db[RESOURCES_COLLECTION].aggregate(section_pipeline))
         print(f"Section stats count: {len(section_stats)}")
 
-        # Debug: Check different types of cost values
-        cost_analysis = list(db[RESOURCES_COLLECTION].aggregate([
+        # cost is numeric on every document (see utils.normalize_cost), so only the valid ones are
+        # matched; both groups read just the cost_valid_department_cost index
+        cost_result = list(db[RESOURCES_COLLECTION].aggregate([
+            {'$match': {'is_cost_valid': True}},
             {'$group': {
-                '_id': {'$type': '$cost'},
-                'count': {'$sum': 1},
-                'sample_values': {'$addToSet': '$cost'}
-            }},
-            {'$addFields': {
-                'sample_values': {'$slice': ['$sample_values', 5]}  # Show first 5 unique values
+                '_id': None, 'total_cost': {'$sum': '$cost'},
+                'count': {'$sum': 1}, 'avg_cost': {'$avg': '$cost'},
+                'min_cost': {'$min': '$cost'}, 'max_cost': {'$max': '$cost'}
             }}
         ]))
-        print("Cost field analysis:", cost_analysis)
-
-        # More comprehensive cost calculation
-        # First, let's identify valid numeric costs
-        valid_cost_pipeline = [
-            {'$match': {'cost': {'$exists': True}}},
-            {'$addFields': {
-                'cost_numeric': {
-                    '$cond': {
-                        'if': {'$in': [{'$type': '$cost'}, ['double', 'int', 'long']]},
-                        'then': '$cost',
-                        'else': {
-                            '$cond': {
-                                'if': {'$and': [
-                                    {'$eq': [{'$type': '$cost'}, 'string']},
-                                    {'$ne': ['$cost', '']}, {'$ne': ['$cost', '---']},
-                                    {'$ne': ['$cost', 'N/A']}, {'$ne': ['$cost', 'n/a']}
-                                ]},
-                                'then': {'$toDouble': '$cost'},
-                                'else': None
-                            }
-                        }
-                    }
-                }
-            }},
-            {'$match': {'cost_numeric': {'$ne': None, '$exists': True}}},
-            {'$addFields': {'is_valid_number': {'$and': [{'$ne': ['$cost_numeric', float('nan')]}, {'$ne': ['$cost_numeric', float('inf')]}, {'$ne': ['$cost_numeric', float('-inf')]}] }}},
-            {'$match': {'is_valid_number': True}},
-            {'$group': {
-                '_id': None, 'total_cost': {'$sum': '$cost_numeric'},
-                'count': {'$sum': 1}, 'avg_cost': {'$avg': '$cost_numeric'},
-                'min_cost': {'$min': '$cost_numeric'}, 'max_cost': {'$max': '$cost_numeric'}
-            }}
-        ]
-        cost_result = list(db[RESOURCES_COLLECTION].aggregate(valid_cost_pipeline))
 
         if cost_result:
             total_cost = cost_result[0].get('total_cost', 0)
@@ -403,27 +463,16 @@ def get_resource_stats():
         else:
             total_cost, valid_cost_count, avg_cost, min_cost, max_cost = 0, 0, 0, 0, 0
 
-        # Department-wise cost calculation (as provided)
-        dept_cost_pipeline = [
-            {'$match': {'cost': {'$exists': True}}},
-            {'$addFields': { # Same conversion logic as above
-                'cost_numeric': {
-                    '$cond': {
-                        'if': {'$in': [{'$type': '$cost'}, ['double', 'int', 'long']]}, 'then': '$cost',
-                        'else': {'$cond': {'if': {'$and': [{'$eq': [{'$type': '$cost'}, 'string']}, {'$ne': ['$cost', '']}, {'$ne': ['$cost', '---']}, {'$ne': ['$cost', 'N/A']}]}, 'then': {'$toDouble': '$cost'}, 'else': None }}
-                    }
-                }
-            }},
-            {'$match': {'cost_numeric': {'$ne': None, '$exists': True}}},
+        dept_cost_stats = list(db[RESOURCES_COLLECTION].aggregate([
+            {'$match': {'is_cost_valid': True}},
             {'$group': {
                 '_id': '$department',
-                'total_cost': {'$sum': '$cost_numeric'},
+                'total_cost': {'$sum': '$cost'},
                 'count': {'$sum': 1},
-                'valid_cost_count': {'$sum': 1} # Simplified, as all here have valid cost
+                'valid_cost_count': {'$sum': 1}
             }},
             {'$sort': {'total_cost': -1}}
-        ]
-        dept_cost_stats = list(db[RESOURCES_COLLECTION].aggregate(dept_cost_pipeline))
+        ]))
 
         excluded_count = total_resources - valid_cost_count
 
@@ -466,7 +515,9 @@ def upload_csv():
             return format_response(error="Parent department is required", status=400)
         
         file = request.files['file']
-        return file_service.upload_csv(file, request, parent_department)
+        return file_service.upload_csv(
+            file, request, parent_department, request.form.get('import_mode'), request.form.get('import_key')
+        )
     except Exception as e:
         app.logger.error(f"CSV upload error: {str(e)}")
         return format_response(error="CSV upload failed", status=500)
@@ -484,7 +535,9 @@ def upload_excel():
             return format_response(error="Parent department is required", status=400)
             
         file = request.files['file']
-        return file_service.upload_excel(file, request, parent_department)
+        return file_service.upload_excel(
+            file, request, parent_department, request.form.get('import_mode'), request.form.get('import_key')
+        )
     except Exception as e:
         app.logger.error(f"Excel upload error: {str(e)}")
         return format_response(error="Excel upload failed", status=500)
@@ -679,7 +732,7 @@ def dashboard_charts():
 def recent_activity():
     try:
         limit = int(request.args.get('limit', 10))
-        return resource_service.recent_activity(limit)
+        return resource_service.recent_activity(limit, request.args.get('fields'))
     except Exception as e:
         app.logger.error(f"Recent activity error: {str(e)}")
         return format_response(error="Failed to fetch recent activity", status=400)
@@ -736,8 +789,8 @@ def admin_verify_page():
             </html>
             """
         
-        user = db[USERS_COLLECTION].find_one({'email': email, 'role': ADMIN_ROLE})
-        if not user:
+        user = user_directory.get_by_email(email)
+        if not user or user.get('role') != ADMIN_ROLE:
             return f"""
             <html>
             <head><title>Admin Verification</title></head>
@@ -861,8 +914,8 @@ def admin_verify_action():
             </html>
             """
         
-        user = db[USERS_COLLECTION].find_one({'email': email, 'role': ADMIN_ROLE})
-        if not user:
+        user = user_directory.get_by_email(email)
+        if not user or user.get('role') != ADMIN_ROLE:
             return f"""
             <html>
             <head><title>Admin Verification</title></head>
@@ -876,10 +929,7 @@ def admin_verify_action():
         
         if action == 'approve':
             # Approve the admin
-            db[USERS_COLLECTION].update_one(
-                {'email': email},
-                {'$set': {'status': USER_STATUS_APPROVED}}
-            )
+            user_directory.update(user, {'status': USER_STATUS_APPROVED})
             
             # Send approval notification email
             try:
@@ -915,10 +965,7 @@ def admin_verify_action():
             
         elif action == 'reject':
             # Reject the admin
-            db[USERS_COLLECTION].update_one(
-                {'email': email},
-                {'$set': {'status': USER_STATUS_REJECTED}}
-            )
+            user_directory.update(user, {'status': USER_STATUS_REJECTED})
             
             # Send rejection notification email
             try:
@@ -0,0 +1,463 @@
+"""
+Performance benchmarks for the campus assets backend.
+
+Run against a scratch MongoDB (never production), e.g.:
+    BENCH_MONGODB_URI=mongodb://localhost:27017 python benchmarks.py sessions --count 1000000
+"""
+import os
+import time
+import uuid
+import argparse
+import statistics
+import datetime
+from pymongo import MongoClient
+
+BENCH_MONGODB_URI = os.getenv('BENCH_MONGODB_URI', 'mongodb://localhost:27017')
+BENCH_DATABASE_NAME = os.getenv('BENCH_DATABASE_NAME', 'campus_assets_bench')
+INSERT_BATCH_SIZE = 10000
+
+def get_bench_db():
+    """Connect to the scratch benchmark database"""
+    client = MongoClient(BENCH_MONGODB_URI)
+    return client[BENCH_DATABASE_NAME]
+
+def measure(fn, runs=50):
+    """Call fn repeatedly and return latency statistics in milliseconds"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+        'runs': runs
+    }
+
+def print_result(label, result):
+    print(f"{label:<40} median {result['median_ms']:>10.3f} ms   p95 {result['p95_ms']:>10.3f} ms")
+
+def bench_sessions(count, runs):
+    """Session lookup latency with many stale sessions, before and after index bootstrap/reaping"""
+    from config import SESSIONS_COLLECTION
+    from indexes import ensure_indexes
+
+    bench_db = get_bench_db()
+    sessions = bench_db[SESSIONS_COLLECTION]
+    sessions.drop()
+
+    print(f"Inserting {count} stale sessions...")
+    expired_at = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    for offset in range(0, count, INSERT_BATCH_SIZE):
+        batch_size = min(INSERT_BATCH_SIZE, count - offset)
+        sessions.insert_many([
+            {
+                'user_id': f"bench_uid_{offset + i}",
+                'session_token': uuid.uuid4().hex * 4,
+                'expires_at': expired_at,
+                'created_at': expired_at - datetime.timedelta(hours=8),
+                'ip_address': None
+            }
+            for i in range(batch_size)
+        ], ordered=False)
+
+    live_token = uuid.uuid4().hex * 4
+    sessions.insert_one({
+        'user_id': 'bench_live_user',
+        'session_token': live_token,
+        'expires_at': datetime.datetime.utcnow() + datetime.timedelta(hours=8),
+        'created_at': datetime.datetime.utcnow(),
+        'ip_address': None
+    })
+
+    lookup = lambda: sessions.find_one({'session_token': live_token})
+    print_result("No index (collection scan)", measure(lookup, runs))
+
+    ensure_indexes(database=bench_db, collections=[SESSIONS_COLLECTION])
+    print_result("Unique session_token index", measure(lookup, runs))
+
+    deleted = sessions.delete_many({'expires_at': {'$lt': datetime.datetime.utcnow()}}).deleted_count
+    print(f"Reaped {deleted} expired sessions")
+    print_result("Index + reaped collection", measure(lookup, runs))
+
+    sessions.drop()
+
+def seed_resources(resources, count):
+    """Insert count synthetic resources with distinct created_at values"""
+    print(f"Inserting {count} resources...")
+    start = datetime.datetime.utcnow() - datetime.timedelta(minutes=count)
+    for offset in range(0, count, INSERT_BATCH_SIZE):
+        batch_size = min(INSERT_BATCH_SIZE, count - offset)
+        resources.insert_many([
+            {
+                'sl_no': str(offset + i),
+                'description': f"Bench asset {offset + i}",
+                'service_tag': f"ST{offset + i:08d}",
+                'identification_number': f"ID{offset + i:08d}",
+                'procurement_date': '2023-01-01',
+                'cost': float((offset + i) % 5000),
+                'location': f"Block {(offset + i) % 20}",
+                'department': f"Dept {(offset + i) % 12}",
+                'parent_department': f"School {(offset + i) % 4}",
+                'created_at': start + datetime.timedelta(minutes=offset + i),
+                'updated_at': start + datetime.timedelta(minutes=offset + i)
+            }
+            for i in range(batch_size)
+        ], ordered=False)
+
+def bench_paging(count, limit, runs):
+    """Resource listing latency at increasing depth: skip/limit pages vs keyset cursors"""
+    from config import RESOURCES_COLLECTION
+    from indexes import ensure_indexes
+    from utils import encode_cursor, keyset_query
+
+    bench_db = get_bench_db()
+    resources = bench_db[RESOURCES_COLLECTION]
+    resources.drop()
+    seed_resources(resources, count)
+    ensure_indexes(database=bench_db, collections=[RESOURCES_COLLECTION])
+
+    sort = [('created_at', -1), ('_id', -1)]
+    for depth in (0, count // 10, count // 2, count - limit):
+        skip_page = lambda: list(resources.find({}).sort(sort).skip(depth).limit(limit + 1))
+        print_result(f"skip/limit at offset {depth}", measure(skip_page, runs))
+
+        # The cursor a client would hold after reading everything before this offset
+        previous = resources.find({}).sort(sort).skip(depth - 1).limit(1)[0] if depth else None
+        if previous:
+            query = keyset_query({}, encode_cursor(previous))
+            keyset_page = lambda: list(resources.find(query).sort(sort).limit(limit + 1))
+            print_result(f"keyset cursor at offset {depth}", measure(keyset_page, runs))
+
+    resources.drop()
+
+def bench_indexes(count, runs):
+    """Latency of the resources listing query shapes before and after ensure_indexes"""
+    from config import RESOURCES_COLLECTION
+    from indexes import ensure_indexes, resource_listing_hint
+
+    bench_db = get_bench_db()
+    resources = bench_db[RESOURCES_COLLECTION]
+    resources.drop()
+    seed_resources(resources, count)
+
+    sort = [('created_at', -1), ('_id', -1)]
+    shapes = [
+        ("unfiltered, newest first", {}),
+        ("department", {'department': 'Dept 3'}),
+        ("location", {'location': 'Block 7'}),
+        ("parent_department", {'parent_department': 'School 1'}),
+        ("cost range", {'cost': {'$gte': 1000, '$lte': 1200}}),
+        ("department + cost range", {'department': 'Dept 3', 'cost': {'$gte': 1000, '$lte': 1200}}),
+    ]
+
+    def run_shapes(label):
+        for name, query in shapes:
+            def page():
+                cursor = resources.find(query).sort(sort).limit(11)
+                hint = resource_listing_hint(query)
+                if hint:
+                    cursor = cursor.hint(hint)
+                return list(cursor)
+            print_result(f"{label}: {name}", measure(page, runs))
+            print_result(f"{label}: {name} (count)", measure(lambda: resources.count_documents(query), runs))
+
+    run_shapes("before")
+    ensure_indexes(database=bench_db, collections=[RESOURCES_COLLECTION])
+    run_shapes("after")
+
+    resources.drop()
+
+def bench_search(count, runs):
+    """Search latency: the regex $or scan versus the relevance-ranked text index"""
+    from config import RESOURCES_COLLECTION
+    from indexes import ensure_indexes
+
+    bench_db = get_bench_db()
+    resources = bench_db[RESOURCES_COLLECTION]
+    resources.drop()
+    seed_resources(resources, count)
+    ensure_indexes(database=bench_db, collections=[RESOURCES_COLLECTION])
+
+    fields = ['description', 'service_tag', 'identification_number', 'location', 'department']
+    for term in ('ST00012345', 'asset 4242', 'Block'):
+        regex_query = {'$or': [{field: {'$regex': term, '$options': 'i'}} for field in fields]}
+        regex_search = lambda: list(resources.find(regex_query).limit(50))
+        print_result(f"regex '{term}'", measure(regex_search, runs))
+
+        score = {'$meta': 'textScore'}
+        text_search = lambda: list(
+            resources.find({'$text': {'$search': term}}, {'score': score}).sort([('score', score)]).limit(50)
+        )
+        print_result(f"text '{term}'", measure(text_search, runs))
+
+    resources.drop()
+
+def bench_fuzzy(count, runs):
+    """Fuzzy search over synthetic typo-laden descriptions: BK-tree candidates vs scoring every record"""
+    import random
+    from bson.objectid import ObjectId
+    from fuzzywuzzy import fuzz, process
+    from fuzzy_index import FuzzyIndex, normalize_text
+
+    random.seed(42)
+    products = [
+        'Oscilloscope - Tektronix', 'Desktop Computer Dell OptiPlex', 'Laser Printer HP LaserJet',
+        'Projector Epson', 'Network Switch Cisco Catalyst', 'Digital Multimeter Fluke', 'UPS APC Smart',
+        'Function Generator Keysight', 'Laptop Lenovo ThinkPad', 'Air Conditioner Voltas Split'
+    ]
+
+    def misspell(text):
+        # Drop or double one letter, like the uploaded sheets do
+        position = random.randrange(len(text))
+        return text[:position] + text[position + 1:] if random.random() < 0.5 else text[:position] + text[position] + text[position:]
+
+    resources = [
+        {
+            '_id': ObjectId(),
+            'description': f"{misspell(random.choice(products))} Unit {i % 500}",
+            'service_tag': f"ST{i:08d}"
+        }
+        for i in range(count)
+    ]
+
+    index = FuzzyIndex(database=None)
+    start = time.perf_counter()
+    index.load(resources)
+    print(f"Indexed {count} records in {time.perf_counter() - start:.1f}s")
+
+    texts = {resource['_id']: normalize_text(f"{resource['description']} {resource['service_tag']}") for resource in resources}
+    for query in ('osciloscope tektronics', 'multimeter fluk', 'ST00004242'):
+        print_result(f"bk-tree '{query}'", measure(lambda: index.search(query), runs))
+        full_scan = lambda: process.extractBests(
+            normalize_text(query), texts, scorer=fuzz.WRatio, processor=None, score_cutoff=70, limit=50
+        )
+        print_result(f"score every record '{query}'", measure(full_scan, max(1, runs // 10)))
+
+def bench_normalize(count, limit, runs):
+    """Listing page normalization: find() plus the Python loop versus the aggregation pipeline"""
+    from config import RESOURCES_COLLECTION
+    from services import RESOURCE_LIST_FIELD_TYPES, SEARCH_SHADOW_EXCLUSION, resource_normalization_stage
+
+    bench_db = get_bench_db()
+    resources = bench_db[RESOURCES_COLLECTION]
+    resources.drop()
+    seed_resources(resources, count)
+
+    sort = {'created_at': -1, '_id': -1}
+
+    def python_loop():
+        page = []
+        for resource in resources.find({}, SEARCH_SHADOW_EXCLUSION).sort(list(sort.items())).limit(limit):
+            resource['_id'] = str(resource['_id'])
+            for date_field in ('created_at', 'updated_at'):
+                if isinstance(resource.get(date_field), datetime.datetime):
+                    resource[date_field] = resource[date_field].isoformat()
+            for field, (field_type, default) in RESOURCE_LIST_FIELD_TYPES.items():
+                resource[field] = field_type(resource.get(field, default))
+            page.append(resource)
+        return page
+
+    pipeline = [
+        {'$sort': sort}, {'$limit': limit}, {'$project': SEARCH_SHADOW_EXCLUSION}, resource_normalization_stage()
+    ]
+    server_side = lambda: list(resources.aggregate(pipeline))
+
+    print_result(f"find + Python loop (limit={limit})", measure(python_loop, runs))
+    print_result(f"aggregation pipeline (limit={limit})", measure(server_side, runs))
+
+    resources.drop()
+
+def bench_bulk(count):
+    """Write throughput: one call per document (like the per-document endpoints) versus one bulk_write"""
+    from pymongo import InsertOne, UpdateOne, DeleteOne
+    from bson.objectid import ObjectId
+    from config import RESOURCES_COLLECTION
+
+    bench_db = get_bench_db()
+    resources = bench_db[RESOURCES_COLLECTION]
+
+    def documents():
+        return [
+            {'_id': ObjectId(), 'sl_no': str(i), 'description': f"Bench asset {i}", 'service_tag': f"ST{i:08d}", 'cost': float(i)}
+            for i in range(count)
+        ]
+
+    # A mix like an audit script: insert, then update and delete what was inserted
+    for label in ('per-document calls', 'one unordered bulk_write'):
+        resources.drop()
+        inserted = documents()
+        start = time.perf_counter()
+        if label == 'per-document calls':
+            for document in inserted:
+                resources.insert_one(document)
+            for document in inserted[:count // 2]:
+                resources.update_one({'_id': document['_id']}, {'$set': {'cost': 1.0}})
+            for document in inserted[count // 2:]:
+                resources.delete_one({'_id': document['_id']})
+        else:
+            resources.bulk_write([InsertOne(document) for document in inserted], ordered=False)
+            resources.bulk_write(
+                [UpdateOne({'_id': document['_id']}, {'$set': {'cost': 1.0}}) for document in inserted[:count // 2]]
+                + [DeleteOne({'_id': document['_id']}) for document in inserted[count // 2:]],
+                ordered=False
+            )
+        elapsed = time.perf_counter() - start
+        print(f"{label:<40} {2 * count} operations in {elapsed:.2f}s ({2 * count / elapsed:,.0f} ops/s)")
+
+    resources.drop()
+
+def bench_stream(count, limit):
+    """Peak Python memory and time of one large listing page: JSON list versus streamed NDJSON"""
+    import tracemalloc
+    from flask import Flask
+    import services
+    from config import RESOURCES_COLLECTION
+    from json_encoding import FastJSONProvider
+
+    bench_db = get_bench_db()
+    resources = bench_db[RESOURCES_COLLECTION]
+    resources.drop()
+    seed_resources(resources, count)
+
+    services.db = bench_db
+    resource_service = services.ResourceService()
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    def json_page():
+        response, _ = resource_service.get_resources({}, 1, limit, count_mode='estimated')
+        return len(response.get_data())
+
+    def ndjson_page():
+        # Consume chunk by chunk, like a WSGI server writing to the socket
+        return sum(len(chunk) for chunk in resource_service.get_resources({}, 1, limit, stream=True).response)
+
+    with app.app_context():
+        for label, fetch in (('JSON list', json_page), ('NDJSON stream', ndjson_page)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            size = fetch()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{label:<20} limit={limit}: {size / 1024:.0f} KiB in {elapsed * 1000:.0f} ms, peak {peak / 1024 / 1024:.1f} MiB")
+
+    resources.drop()
+
+def bench_compression(count, runs):
+    """Bytes and latency of listing/export-shaped responses per Accept-Encoding, in-process (no MongoDB needed)"""
+    import io
+    import pandas as pd
+    from bson.objectid import ObjectId
+    from flask import Flask, jsonify, send_file
+    from compression import compress_response, brotli
+    from json_encoding import FastJSONProvider
+
+    start = datetime.datetime.utcnow() - datetime.timedelta(minutes=count)
+    resources = [
+        {
+            '_id': ObjectId(),
+            'sl_no': str(i),
+            'description': f"Bench asset {i}",
+            'service_tag': f"ST{i:08d}",
+            'identification_number': f"ID{i:08d}",
+            'procurement_date': '2023-01-01',
+            'cost': float(i % 5000),
+            'location': f"Block {i % 20}",
+            'department': f"Dept {i % 12}",
+            'parent_department': f"School {i % 4}",
+            'created_at': start + datetime.timedelta(minutes=i)
+        }
+        for i in range(count)
+    ]
+    df = pd.DataFrame(resources).drop(columns=['_id', 'created_at'])
+    csv_data = df.to_csv(index=False).encode('utf-8')
+    xlsx_output = io.BytesIO()
+    with pd.ExcelWriter(xlsx_output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Resources')
+    xlsx_data = xlsx_output.getvalue()
+
+    # Same response construction as the listing and export endpoints
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
+    app.add_url_rule('/listing', 'listing', lambda: jsonify({'data': {'resources': resources}}))
+    app.add_url_rule('/csv', 'csv', lambda: send_file(io.BytesIO(csv_data), mimetype='text/csv'))
+    app.add_url_rule('/xlsx', 'xlsx', lambda: send_file(
+        io.BytesIO(xlsx_data), mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    ))
+    client = app.test_client()
+
+    encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+    for path in ('/listing', '/csv', '/xlsx'):
+        for encoding in encodings:
+            fetch = lambda: client.get(path, headers={'Accept-Encoding': encoding}).get_data()
+            size = len(fetch())
+            print_result(f"{path} {encoding} ({size / 1024:.0f} KiB)", measure(fetch, runs))
+
+def main():
+    parser = argparse.ArgumentParser(description="Campus assets backend benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    sessions_parser = subparsers.add_parser('sessions', help="Session lookup with stale sessions")
+    sessions_parser.add_argument('--count', type=int, default=1000000)
+    sessions_parser.add_argument('--runs', type=int, default=50)
+
+    paging_parser = subparsers.add_parser('paging', help="Resource listing at increasing page depth")
+    paging_parser.add_argument('--count', type=int, default=200000)
+    paging_parser.add_argument('--limit', type=int, default=10)
+    paging_parser.add_argument('--runs', type=int, default=20)
+
+    indexes_parser = subparsers.add_parser('indexes', help="Resource query shapes before/after index bootstrap")
+    indexes_parser.add_argument('--count', type=int, default=500000)
+    indexes_parser.add_argument('--runs', type=int, default=20)
+
+    search_parser = subparsers.add_parser('search', help="Regex scan versus text index search")
+    search_parser.add_argument('--count', type=int, default=200000)
+    search_parser.add_argument('--runs', type=int, default=20)
+
+    fuzzy_parser = subparsers.add_parser('fuzzy', help="Fuzzy search, in-process (no MongoDB needed)")
+    fuzzy_parser.add_argument('--count', type=int, default=100000)
+    fuzzy_parser.add_argument('--runs', type=int, default=20)
+
+    normalize_parser = subparsers.add_parser('normalize', help="Python normalization loop versus aggregation")
+    normalize_parser.add_argument('--count', type=int, default=20000)
+    normalize_parser.add_argument('--limit', type=int, default=1000)
+    normalize_parser.add_argument('--runs', type=int, default=20)
+
+    bulk_parser = subparsers.add_parser('bulk', help="Per-document writes versus one bulk_write")
+    bulk_parser.add_argument('--count', type=int, default=10000)
+
+    stream_parser = subparsers.add_parser('stream', help="Peak memory of a large listing page, JSON versus NDJSON")
+    stream_parser.add_argument('--count', type=int, default=50000)
+    stream_parser.add_argument('--limit', type=int, default=50000)
+
+    compression_parser = subparsers.add_parser('compression', help="Response bytes and latency per encoding, in-process")
+    compression_parser.add_argument('--count', type=int, default=5000)
+    compression_parser.add_argument('--runs', type=int, default=20)
+
+    args = parser.parse_args()
+    if args.benchmark == 'sessions':
+        bench_sessions(args.count, args.runs)
+    elif args.benchmark == 'paging':
+        bench_paging(args.count, args.limit, args.runs)
+    elif args.benchmark == 'indexes':
+        bench_indexes(args.count, args.runs)
+    elif args.benchmark == 'search':
+        bench_search(args.count, args.runs)
+    elif args.benchmark == 'fuzzy':
+        bench_fuzzy(args.count, args.runs)
+    elif args.benchmark == 'normalize':
+        bench_normalize(args.count, args.limit, args.runs)
+    elif args.benchmark == 'bulk':
+        bench_bulk(args.count)
+    elif args.benchmark == 'stream':
+        bench_stream(args.count, args.limit)
+    elif args.benchmark == 'compression':
+        bench_compression(args.count, args.runs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import zlib
+from flask import request
+
+from config import (
+    COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY, COMPRESS_XLSX
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Formats that are compressed already
+INCOMPRESSIBLE_MIMETYPES = {'application/pdf', 'application/zip', 'application/gzip', 'image/png', 'image/jpeg', 'image/gif'}
+if not COMPRESS_XLSX:
+    INCOMPRESSIBLE_MIMETYPES.add(XLSX_MIMETYPE)
+
+def negotiate_encoding():
+    """Best encoding the client accepts, honouring q-values; None for identity"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+def _compressor(encoding):
+    """(compress, flush, finish) callables for one response body"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits 31 writes the gzip header and trailer
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def compress_bytes(data, encoding):
+    compress, _, finish = _compressor(encoding)
+    return compress(data) + finish()
+
+def _compress_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk, flushing each so clients see progress"""
+    compress, flush, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def drop_encoded_ranges():
+    """before_request hook ignoring Range for clients that get encoded bodies, which don't support ranges.
+
+    A 206 is only served from the identity bytes, so it is kept when If-Range carries a strong ETag
+    (encoded responses only ever carry weak ones); answering a Range with the full 200 is always allowed.
+    """
+    if not COMPRESSION_ENABLED or 'HTTP_RANGE' not in request.environ:
+        return
+    if request.headers.get('If-Range', '').strip().startswith('"'):
+        return
+    if negotiate_encoding() is not None:
+        del request.environ['HTTP_RANGE']
+
+def compress_response(response):
+    """after_request hook compressing responses for clients that accept it"""
+    if not COMPRESSION_ENABLED or request.method == 'HEAD':
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if 'Content-Encoding' in response.headers or response.mimetype in INCOMPRESSIBLE_MIMETYPES:
+        return response
+
+    # Known sizes are checked before negotiating; streams of unknown length are always compressed
+    if response.content_length is not None and response.content_length < COMPRESSION_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # Generators and send_file bodies; the compressed length is not known up front
+        response.response = _compress_stream(response.iter_encoded(), encoding)
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    # Ranges would be served from the identity bytes (send_file answers them with a 206 we don't
+    # compress), which a client resuming this download would splice onto the encoded body
+    response.headers.pop('Accept-Ranges', None)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Same content, different bytes: only a weak validator still holds (conditional_get compares weakly)
+        response.set_etag(etag, weak=True)
+    return response
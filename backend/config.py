@@ -80,9 +80,65 @@ USER_STATUS_PENDING = 'pending'
 USER_STATUS_APPROVED = 'approved'
 USER_STATUS_REJECTED = 'rejected'
 
-# Email settings
-SMTP_SERVER = 'smtp.gmail.com'
-SMTP_PORT = 587
+# Email settings (point SMTP_SERVER/SMTP_PORT at a local sink with SMTP_USE_TLS=false for testing)
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
+
+# Email outbox worker
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', '20'))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv('EMAIL_OUTBOX_POLL_SECONDS', '10'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', '30'))
+EMAIL_OUTBOX_IDLE_DISCONNECT_SECONDS = int(os.getenv('EMAIL_OUTBOX_IDLE_DISCONNECT_SECONDS', '60'))
+EMAIL_OUTBOX_RETENTION_SECONDS = int(os.getenv('EMAIL_OUTBOX_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+# Firebase ID token verification
+FIREBASE_CERT_URL = os.getenv(
+    'FIREBASE_CERT_URL',
+    'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+)
+FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID')
+FIREBASE_TOKEN_CACHE_SIZE = int(os.getenv('FIREBASE_TOKEN_CACHE_SIZE', '10000'))
+# JSON file of {kid: certificate PEM} served locally in place of Google's endpoint (offline testing only)
+FIREBASE_STANDIN_CERTS_FILE = os.getenv('FIREBASE_STANDIN_CERTS_FILE')
+
+# User directory cache (bounds how long other workers may serve a stale user record)
+USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', '60'))
+USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', '10000'))
+
+# Session mode: 'stateful' checks the sessions collection on every request,
+# 'stateless' trusts the JWT signature and exp and only consults the revocation denylist
+SESSION_MODE_STATEFUL = 'stateful'
+SESSION_MODE_STATELESS = 'stateless'
+SESSION_MODE = os.getenv('SESSION_MODE', SESSION_MODE_STATEFUL).lower()
+REVOCATION_SYNC_SECONDS = float(os.getenv('REVOCATION_SYNC_SECONDS', '5'))
+
+# Session cache settings
+SESSION_CACHE_MAX_SIZE = int(os.getenv('SESSION_CACHE_MAX_SIZE', '10000'))
+SESSION_CACHE_SYNC_SECONDS = float(os.getenv('SESSION_CACHE_SYNC_SECONDS', '5'))
+SESSION_INVALIDATION_RETENTION_SECONDS = int(os.getenv('SESSION_INVALIDATION_RETENTION_SECONDS', '3600'))
+
+# Index bootstrap: build missing registered indexes at startup (disable to run 'python indexes.py' manually)
+ENSURE_INDEXES_ON_STARTUP = os.getenv('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+INDEX_BUILD_PROGRESS_SECONDS = float(os.getenv('INDEX_BUILD_PROGRESS_SECONDS', '5'))
+
+# Background reaper for expired sessions (for deployments where the TTL monitor is disabled)
+SESSION_REAPER_ENABLED = os.getenv('SESSION_REAPER_ENABLED', 'false').lower() == 'true'
+SESSION_REAPER_INTERVAL_SECONDS = int(os.getenv('SESSION_REAPER_INTERVAL_SECONDS', '300'))
+
+# Resource listing counts: 'exact' runs count_documents, 'estimated' uses collection metadata when
+# unfiltered, 'cached' reuses a count until the resources write generation changes
+COUNT_MODE_EXACT = 'exact'
+COUNT_MODE_ESTIMATED = 'estimated'
+COUNT_MODE_CACHED = 'cached'
+COUNT_MODES = (COUNT_MODE_EXACT, COUNT_MODE_ESTIMATED, COUNT_MODE_CACHED)
+RESOURCE_COUNT_MODE = os.getenv('RESOURCE_COUNT_MODE', COUNT_MODE_EXACT).lower()
+COUNT_CACHE_MAX_SIZE = int(os.getenv('COUNT_CACHE_MAX_SIZE', '1000'))
+COUNT_CACHE_TTL_SECONDS = int(os.getenv('COUNT_CACHE_TTL_SECONDS', '600'))
+
+# How often a worker picks up write generations bumped by other workers
+WRITE_GENERATION_SYNC_SECONDS = float(os.getenv('WRITE_GENERATION_SYNC_SECONDS', '2'))
 
 # Resource required fields
 RESOURCE_REQUIRED_FIELDS = [
@@ -90,6 +146,76 @@ RESOURCE_REQUIRED_FIELDS = [
     'procurement_date', 'cost', 'location', 'department'
 ]
 
+# Resource search: 'regex' matches substrings of every field but scans the collection,
+# 'text' uses the weighted text index (whole words) and ranks results by relevance,
+# 'fuzzy' tolerates typos in descriptions and service tags via an in-memory BK-tree
+SEARCH_MODE_REGEX = 'regex'
+SEARCH_MODE_TEXT = 'text'
+SEARCH_MODE_FUZZY = 'fuzzy'
+SEARCH_MODES = (SEARCH_MODE_REGEX, SEARCH_MODE_TEXT, SEARCH_MODE_FUZZY)
+RESOURCE_SEARCH_MODE = os.getenv('RESOURCE_SEARCH_MODE', SEARCH_MODE_REGEX).lower()
+FUZZY_MAX_CANDIDATES = int(os.getenv('FUZZY_MAX_CANDIDATES', '500'))
+FUZZY_SCORE_CUTOFF = int(os.getenv('FUZZY_SCORE_CUTOFF', '70'))
+# Minimum seconds between fuzzy index rebuilds; writes in between are picked up by the next one
+FUZZY_REBUILD_MIN_SECONDS = float(os.getenv('FUZZY_REBUILD_MIN_SECONDS', '30'))
+
+# match= semantics of regex searches: 'contains' is a case-insensitive substring scan,
+# 'prefix' and 'exact' seek the indexed lowercase shadow copies of these fields
+MATCH_CONTAINS = 'contains'
+MATCH_PREFIX = 'prefix'
+MATCH_EXACT = 'exact'
+MATCH_MODES = (MATCH_CONTAINS, MATCH_PREFIX, MATCH_EXACT)
+SEARCH_SHADOW_FIELDS = {
+    'description': 'description_lc',
+    'service_tag': 'service_tag_lc',
+    'identification_number': 'identification_number_lc',
+    'location': 'location_lc',
+    'department': 'department_lc'
+}
+
+# Typeahead suggestions, served from an in-memory prefix index over these fields
+SUGGEST_FIELDS = ['service_tag', 'identification_number', 'description', 'department', 'location']
+SUGGEST_MAX_RESULTS = int(os.getenv('SUGGEST_MAX_RESULTS', '25'))
+# Minimum seconds between suggestion index rebuilds for writes this process didn't apply
+SUGGEST_REBUILD_MIN_SECONDS = float(os.getenv('SUGGEST_REBUILD_MIN_SECONDS', '30'))
+
+# Most ids one POST /api/resources/batch-get may ask for
+BATCH_GET_MAX_IDS = int(os.getenv('BATCH_GET_MAX_IDS', '500'))
+# Most operations one POST /api/resources/bulk may carry
+BULK_MAX_OPERATIONS = int(os.getenv('BULK_MAX_OPERATIONS', '1000'))
+
+# Upload import mode: 'insert' adds every row, 'upsert' updates the resource an earlier upload
+# created for the same natural key (so re-uploading a sheet is idempotent)
+IMPORT_MODE_INSERT = 'insert'
+IMPORT_MODE_UPSERT = 'upsert'
+IMPORT_MODES = [IMPORT_MODE_INSERT, IMPORT_MODE_UPSERT]
+UPLOAD_IMPORT_MODE = os.getenv('UPLOAD_IMPORT_MODE', IMPORT_MODE_INSERT).lower()
+# Natural keys an upsert import can match on, and the fields making up each
+IMPORT_KEYS = {
+    'identification_number': ['identification_number'],
+    'service_tag_department': ['service_tag', 'department']
+}
+UPLOAD_IMPORT_KEY = os.getenv('UPLOAD_IMPORT_KEY', 'identification_number').lower()
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+
+# Documents per cursor batch, and per written chunk, when /api/resources streams NDJSON
+RESOURCE_STREAM_BATCH_SIZE = int(os.getenv('RESOURCE_STREAM_BATCH_SIZE', '1000'))
+
+# Fields clients may request through the fields= parameter (_id is always returned)
+RESOURCE_PROJECTABLE_FIELDS = [
+    'sl_no', 'description', 'service_tag', 'identification_number', 'procurement_date',
+    'cost', 'is_cost_valid', 'cost_raw', 'location', 'department', 'parent_department', 'section_location', 'product_category',
+    'created_by', 'created_at', 'updated_by', 'updated_at'
+]
+
+# Response compression (brotli when the 'brotli' package is installed and the client accepts it, else gzip)
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+# XLSX files are zip archives already; recompressing them costs CPU for a few percent
+COMPRESS_XLSX = os.getenv('COMPRESS_XLSX', 'false').lower() == 'true'
+
 # CSV column mappings
 CSV_COLUMN_MAPPING = {
     'SL No': 'sl_no',
@@ -107,6 +233,10 @@ USERS_COLLECTION = 'users'
 RESOURCES_COLLECTION = 'resources'
 SESSIONS_COLLECTION = 'sessions'
 CHAT_HISTORY_COLLECTION = 'chat_history'
+SESSION_INVALIDATIONS_COLLECTION = 'session_invalidations'
+REVOKED_TOKENS_COLLECTION = 'revoked_tokens'
+EMAIL_OUTBOX_COLLECTION = 'email_outbox'
+WRITE_GENERATIONS_COLLECTION = 'write_generations'
 # Add this section to your config.py
 
 # MongoDB setup with your specific connection
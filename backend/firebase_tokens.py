@@ -0,0 +1,137 @@
+import re
+import time
+import hashlib
+import threading
+import requests
+import firebase_admin
+from google.auth import jwt as google_jwt
+
+from config import FIREBASE_CERT_URL, FIREBASE_PROJECT_ID, FIREBASE_TOKEN_CACHE_SIZE
+from cache import TTLCache
+
+FIREBASE_ISSUER_PREFIX = 'https://securetoken.google.com/'
+CERT_REFRESH_MARGIN_SECONDS = 300
+CERT_MIN_REFRESH_SECONDS = 60
+CERT_FETCH_TIMEOUT_SECONDS = 10
+# Tokens with an unknown key id may refetch the certificates at most this often, so forged
+# tokens cannot turn every login attempt into a fetch that other logins queue behind
+CERT_UNKNOWN_KID_REFRESH_SECONDS = 60
+
+class CertificateCache:
+    """Keeps Google's token signing certificates in memory and refreshes them before they expire"""
+
+    def __init__(self, url):
+        self.url = url
+        self._certs = None
+        self._expires_at = 0.0
+        self._fetched_at = float('-inf')
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def get(self):
+        """Return the current certificates, fetching them only if none are cached or they expired"""
+        if self._certs is None or time.monotonic() >= self._expires_at:
+            self.refresh()
+        return self._certs
+
+    def refresh(self, force=False):
+        """Fetch the certificates and remember them for the max-age Google advertises.
+
+        Unless forced, nothing is fetched when certificates are still valid, e.g. because another
+        thread refreshed them while this one waited for the lock. Returns their remaining lifetime.
+        """
+        with self._lock:
+            if not force and self._certs is not None and time.monotonic() < self._expires_at:
+                return int(self._expires_at - time.monotonic())
+            return self._fetch()
+
+    def refresh_for_kid(self, kid):
+        """Refetch for a token signed with an unknown key, at most every CERT_UNKNOWN_KID_REFRESH_SECONDS"""
+        with self._lock:
+            if self._certs is not None and kid in self._certs:
+                return self._certs
+            if time.monotonic() - self._fetched_at >= CERT_UNKNOWN_KID_REFRESH_SECONDS:
+                self._fetch()
+            return self._certs
+
+    def _fetch(self):
+        """Fetch the certificates; the caller holds the lock"""
+        response = requests.get(self.url, timeout=CERT_FETCH_TIMEOUT_SECONDS)
+        response.raise_for_status()
+
+        max_age = 3600
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        if match:
+            max_age = int(match.group(1))
+
+        self._certs = response.json()
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+        return max_age
+
+    def start_background_refresh(self):
+        """Prefetch now and keep refreshing ahead of expiry so logins never pay the fetch"""
+        if self._refresher is not None:
+            return self._refresher
+
+        def run():
+            while True:
+                try:
+                    max_age = self.refresh(force=True)
+                    delay = max(max_age - CERT_REFRESH_MARGIN_SECONDS, CERT_MIN_REFRESH_SECONDS)
+                except Exception as e:
+                    print(f"❌ Firebase certificate refresh failed: {e}")
+                    delay = CERT_MIN_REFRESH_SECONDS
+                time.sleep(delay)
+
+        self._refresher = threading.Thread(target=run, name='firebase-cert-refresh', daemon=True)
+        self._refresher.start()
+        return self._refresher
+
+certificate_cache = CertificateCache(FIREBASE_CERT_URL)
+_verified_tokens = TTLCache(max_size=FIREBASE_TOKEN_CACHE_SIZE)
+
+def get_project_id():
+    """Firebase project the ID tokens must be issued for"""
+    if FIREBASE_PROJECT_ID:
+        return FIREBASE_PROJECT_ID
+    return firebase_admin.get_app().project_id
+
+def _verify_signature_and_claims(id_token):
+    """Verify signature, expiry, audience, issuer and subject like firebase_auth.verify_id_token"""
+    project_id = get_project_id()
+    if not project_id:
+        raise ValueError("Firebase project ID is not configured")
+
+    header = google_jwt.decode_header(id_token)
+    if header.get('alg') != 'RS256':
+        raise ValueError(f"Firebase ID token has incorrect algorithm: {header.get('alg')}")
+
+    certs = certificate_cache.get()
+    if header.get('kid') not in certs:
+        # Google may have rotated its keys since the last fetch
+        certs = certificate_cache.refresh_for_kid(header.get('kid'))
+
+    claims = google_jwt.decode(id_token, certs=certs, audience=project_id)
+
+    if claims.get('iss') != FIREBASE_ISSUER_PREFIX + project_id:
+        raise ValueError(f"Firebase ID token has incorrect issuer: {claims.get('iss')}")
+
+    subject = claims.get('sub')
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Firebase ID token has an invalid subject claim")
+
+    claims['uid'] = subject
+    return claims
+
+def verify_firebase_id_token(id_token):
+    """Verify a Firebase ID token, reusing the result until the token expires"""
+    token_hash = hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    cached = _verified_tokens.get(token_hash)
+    if cached is not None:
+        return dict(cached)
+
+    claims = _verify_signature_and_claims(id_token)
+    _verified_tokens.set(token_hash, claims, claims['exp'] - time.time())
+    return dict(claims)
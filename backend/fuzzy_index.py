@@ -0,0 +1,186 @@
+import re
+import time
+import heapq
+import threading
+import Levenshtein
+from fuzzywuzzy import fuzz, process
+
+from config import db, RESOURCES_COLLECTION, FUZZY_MAX_CANDIDATES, FUZZY_SCORE_CUTOFF, FUZZY_REBUILD_MIN_SECONDS
+from write_generation import resource_generation
+
+FUZZY_FIELDS = ['description', 'service_tag']
+MIN_TOKEN_LENGTH = 3
+
+def normalize_text(value):
+    """Lowercase and collapse everything but letters and digits to single spaces"""
+    return re.sub(r'[^a-z0-9]+', ' ', str(value).lower()).strip()
+
+def max_distance(token):
+    """Typos tolerated for a query token: none for short tokens, more for longer ones"""
+    if len(token) <= 3:
+        return 0
+    if len(token) <= 7:
+        return 1
+    return 2
+
+class BKTree:
+    """Burkhard-Keller tree over words under Levenshtein distance"""
+
+    def __init__(self, words=()):
+        self._root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self._root is None:
+            self._root = (word, {})
+            return
+
+        node = self._root
+        while True:
+            distance = Levenshtein.distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word, tolerance):
+        """Words within tolerance edits of word"""
+        if self._root is None:
+            return []
+
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_word, children = stack.pop()
+            distance = Levenshtein.distance(word, node_word)
+            if distance <= tolerance:
+                matches.append(node_word)
+            # Triangle inequality: only children within [d - tolerance, d + tolerance] can match
+            for child_distance in range(distance - tolerance, distance + tolerance + 1):
+                child = children.get(child_distance)
+                if child is not None:
+                    stack.append(child)
+        return matches
+
+class FuzzyIndex:
+    """Typo-tolerant candidate index over normalized descriptions and service tags.
+
+    Query tokens are looked up in a BK-tree of indexed words, the postings of the matching words
+    give candidate resources, and only those candidates are rescored with fuzzywuzzy in one batch.
+    Rebuilt in the background when the resources write generation moves, at most once every
+    rebuild_min_seconds, so a stream of edits does not keep a rebuild running.
+    """
+
+    def __init__(self, database=None, rebuild_min_seconds=FUZZY_REBUILD_MIN_SECONDS):
+        self.database = database if database is not None else db
+        self.rebuild_min_seconds = rebuild_min_seconds
+        self._tree = BKTree()
+        self._postings = {}
+        self._texts = {}
+        self._generation = None
+        self._loaded = False
+        self._rebuilt_at = float('-inf')
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def search(self, query, limit=50, max_candidates=FUZZY_MAX_CANDIDATES, score_cutoff=FUZZY_SCORE_CUTOFF):
+        """Best matching resource ids as [(resource_id, score)], most similar first.
+
+        Returns None while the index is still being built for the first time.
+        """
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+        self._ensure_fresh()
+        if not self._loaded:
+            return None
+
+        tokens = normalized.split()
+        # Short tokens are too ambiguous to generate candidates unless they are all we have
+        long_tokens = [token for token in tokens if len(token) >= MIN_TOKEN_LENGTH] or tokens
+
+        with self._lock:
+            tree, postings, texts = self._tree, self._postings, self._texts
+
+        # Candidates matching more of the query tokens go first
+        token_hits = {}
+        for token in long_tokens:
+            matched = set()
+            for word in tree.search(token, max_distance(token)):
+                matched.update(postings[word])
+            for resource_id in matched:
+                token_hits[resource_id] = token_hits.get(resource_id, 0) + 1
+        candidates = heapq.nlargest(max_candidates, token_hits, key=token_hits.get)
+
+        # One batched rescoring pass over the candidates only
+        choices = {resource_id: texts[resource_id] for resource_id in candidates}
+        ranked = process.extractBests(
+            normalized, choices, scorer=fuzz.WRatio, processor=None,
+            score_cutoff=score_cutoff, limit=limit
+        )
+        return [(resource_id, score) for _, score, resource_id in ranked]
+
+    def rebuild(self):
+        """Rebuild from the collection; returns the number of indexed resources"""
+        # Read the generation first, so writes racing the scan trigger another rebuild
+        generation = resource_generation.current()
+        self._rebuilt_at = time.monotonic()
+        projection = {field: 1 for field in FUZZY_FIELDS}
+        return self.load(self.database[RESOURCES_COLLECTION].find({}, projection).batch_size(5000), generation)
+
+    def load(self, resources, generation=None):
+        """Replace the index with the given resource documents"""
+        postings = {}
+        texts = {}
+        for resource in resources:
+            text = ' '.join(normalize_text(resource.get(field) or '') for field in FUZZY_FIELDS).strip()
+            if not text:
+                continue
+            texts[resource['_id']] = text
+            for word in set(text.split()):
+                postings.setdefault(word, []).append(resource['_id'])
+
+        tree = BKTree(postings)
+        with self._lock:
+            self._tree, self._postings, self._texts = tree, postings, texts
+            self._generation = generation
+            self._loaded = True
+        return len(texts)
+
+    def _ensure_fresh(self):
+        if self.database is None:
+            return
+        if self._generation is None:
+            # First use; searches fall back to regex until the build (or startup warm-up) finishes
+            self.rebuild_in_background()
+        elif resource_generation.current() != self._generation:
+            # Writes within rebuild_min_seconds of the last rebuild wait and share the next one
+            delay = self._rebuilt_at + self.rebuild_min_seconds - time.monotonic()
+            self.rebuild_in_background(delay=max(delay, 0))
+
+    def rebuild_in_background(self, delay=0):
+        """Rebuild on a background thread after delay seconds, unless a rebuild is already pending"""
+        if self.database is None:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                if delay:
+                    time.sleep(delay)
+                self.rebuild()
+            except Exception as e:
+                print(f"❌ Fuzzy index rebuild failed: {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name='fuzzy-rebuild', daemon=True).start()
+
+resource_fuzzy_index = FuzzyIndex()
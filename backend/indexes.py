@@ -0,0 +1,212 @@
+import argparse
+import threading
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+from config import (
+    db, USERS_COLLECTION, RESOURCES_COLLECTION, SESSIONS_COLLECTION, SESSION_INVALIDATIONS_COLLECTION, REVOKED_TOKENS_COLLECTION,
+    EMAIL_OUTBOX_COLLECTION, SESSION_INVALIDATION_RETENTION_SECONDS, EMAIL_OUTBOX_RETENTION_SECONDS,
+    INDEX_BUILD_PROGRESS_SECONDS, SEARCH_SHADOW_FIELDS
+)
+
+# Declarative index registry: collection name -> list of index specs
+INDEX_REGISTRY = {
+    USERS_COLLECTION: [
+        # Partial, so legacy documents without the field don't collide on null
+        {
+            'keys': [('firebase_uid', ASCENDING)],
+            'name': 'firebase_uid_unique',
+            'unique': True,
+            'partialFilterExpression': {'firebase_uid': {'$type': 'string'}}
+        },
+        {
+            'keys': [('email', ASCENDING)],
+            'name': 'email_unique',
+            'unique': True,
+            'partialFilterExpression': {'email': {'$type': 'string'}}
+        },
+    ],
+    RESOURCES_COLLECTION: [
+        # Serves the listing sort and its keyset cursor without an in-memory sort
+        {'keys': [('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'created_at_id'},
+        # Equality filter + listing sort; the prefixes also serve distinct() for the filter dropdowns
+        {'keys': [('department', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'department_created_at'},
+        {'keys': [('location', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], 'name': 'location_created_at'},
+        {
+            'keys': [('parent_department', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+            'name': 'parent_department_created_at'
+        },
+        # One resource per natural key for upsert imports; legacy rows without a key don't collide
+        {
+            'keys': [('import_key', ASCENDING)],
+            'name': 'import_key_unique',
+            'unique': True,
+            'partialFilterExpression': {'import_key': {'$type': 'string'}}
+        },
+        # Cost range filters on their own
+        {'keys': [('cost', ASCENDING)], 'name': 'cost'},
+        # Covers the cost statistics: valid costs in total and grouped by department
+        {
+            'keys': [('is_cost_valid', ASCENDING), ('department', ASCENDING), ('cost', ASCENDING)],
+            'name': 'cost_valid_department_cost'
+        },
+        # Prefix and exact matches seek the lowercase shadow fields
+        *[
+            {'keys': [(shadow_field, ASCENDING)], 'name': shadow_field}
+            for shadow_field in SEARCH_SHADOW_FIELDS.values()
+        ],
+        # Relevance search; identifiers weigh most. No language, so codes aren't stemmed and
+        # short department names like 'IT' aren't dropped as stop words
+        {
+            'keys': [
+                ('description', TEXT), ('service_tag', TEXT), ('identification_number', TEXT),
+                ('location', TEXT), ('department', TEXT)
+            ],
+            'name': 'resource_text',
+            'weights': {'service_tag': 10, 'identification_number': 10, 'description': 5, 'location': 2, 'department': 2},
+            'default_language': 'none'
+        },
+    ],
+    SESSIONS_COLLECTION: [
+        {'keys': [('session_token', ASCENDING)], 'name': 'session_token_unique', 'unique': True},
+        # TTL monitor removes sessions as soon as expires_at has passed
+        {'keys': [('expires_at', ASCENDING)], 'name': 'expires_at_ttl', 'expireAfterSeconds': 0},
+        {'keys': [('user_id', ASCENDING)], 'name': 'user_id'},
+    ],
+    REVOKED_TOKENS_COLLECTION: [
+        {'keys': [('jti', ASCENDING)], 'name': 'jti_unique', 'unique': True},
+        {'keys': [('revoked_at', ASCENDING)], 'name': 'revoked_at'},
+        # A revoked token only needs to be remembered until it would have expired anyway
+        {'keys': [('expires_at', ASCENDING)], 'name': 'expires_at_ttl', 'expireAfterSeconds': 0},
+    ],
+    SESSION_INVALIDATIONS_COLLECTION: [
+        {
+            'keys': [('created_at', ASCENDING)],
+            'name': 'created_at_ttl',
+            'expireAfterSeconds': SESSION_INVALIDATION_RETENTION_SECONDS
+        },
+    ],
+    EMAIL_OUTBOX_COLLECTION: [
+        {'keys': [('status', ASCENDING), ('next_attempt_at', ASCENDING)], 'name': 'status_next_attempt_at'},
+        # Only delivered emails carry sent_at, so pending and failed ones are kept
+        {'keys': [('sent_at', ASCENDING)], 'name': 'sent_at_ttl', 'expireAfterSeconds': EMAIL_OUTBOX_RETENTION_SECONDS},
+    ],
+}
+
+# Equality filters of the resources listing, in order of selectivity, and the index serving each with the
+# created_at sort. With a cost range as well, the planner tends to pick the cost index and sort in memory.
+RESOURCE_LISTING_HINTS = [
+    ('department', 'department_created_at'),
+    ('location', 'location_created_at'),
+    ('parent_department', 'parent_department_created_at'),
+]
+
+# (collection, index name) pairs known to exist, so hints never name a missing index
+_available_indexes = set()
+
+def resource_listing_hint(query):
+    """Index name to hint for a resources listing query, or None to leave it to the planner"""
+    if '$text' in query or '_id' in query:
+        # $text must use the text index, and an _id match beats any filter index
+        return None
+    for field, index_name in RESOURCE_LISTING_HINTS:
+        if isinstance(query.get(field), str) and (RESOURCES_COLLECTION, index_name) in _available_indexes:
+            return index_name
+    return None
+
+def _watch_index_build(database, collection_name, index_name, finished):
+    """Print build progress from currentOp until finished is set"""
+    namespace = f"{database.name}.{collection_name}"
+    while not finished.wait(INDEX_BUILD_PROGRESS_SECONDS):
+        try:
+            ops = database.client.admin.command('currentOp', {'ns': namespace, 'command.createIndexes': collection_name})
+        except Exception:
+            # Not permitted on some hosted tiers; the build itself is unaffected
+            return
+        for op in ops.get('inprog', []):
+            progress = op.get('progress') or {}
+            if progress.get('total'):
+                percent = 100 * progress['done'] / progress['total']
+                print(f"⏳ Building {index_name} on {collection_name}: {progress['done']}/{progress['total']} ({percent:.0f}%)")
+            elif op.get('msg'):
+                print(f"⏳ Building {index_name} on {collection_name}: {op['msg']}")
+
+def ensure_indexes(database=None, collections=None):
+    """Create every registered index that does not exist yet; safe to run repeatedly"""
+    database = database if database is not None else db
+    if database is None:
+        print("❌ Skipping index bootstrap: database connection not available")
+        return {}
+
+    report = {}
+    for collection_name, specs in INDEX_REGISTRY.items():
+        if collections and collection_name not in collections:
+            continue
+
+        report[collection_name] = []
+        existing = database[collection_name].index_information()
+        for spec in specs:
+            if spec['name'] in existing:
+                _available_indexes.add((collection_name, spec['name']))
+                report[collection_name].append({'name': spec['name'], 'status': 'exists'})
+                continue
+
+            options = {key: value for key, value in spec.items() if key != 'keys'}
+            print(f"🔨 Building index {spec['name']} on {collection_name}...")
+            finished = threading.Event()
+            watcher = threading.Thread(
+                target=_watch_index_build, args=(database, collection_name, spec['name'], finished), daemon=True
+            )
+            watcher.start()
+            try:
+                name = database[collection_name].create_index(spec['keys'], **options)
+                _available_indexes.add((collection_name, name))
+                report[collection_name].append({'name': name, 'status': 'created'})
+                print(f"✅ Index {name} on {collection_name} ready")
+            except OperationFailure as e:
+                # Typically an existing index with different options, or duplicate keys for a unique index
+                print(f"❌ Index {spec['name']} on {collection_name} failed: {e}")
+                report[collection_name].append({'name': spec['name'], 'status': 'failed', 'error': str(e)})
+            finally:
+                finished.set()
+
+    return report
+
+def check_indexes(database=None, collections=None):
+    """Compare registered and existing indexes without building anything"""
+    database = database if database is not None else db
+    if database is None:
+        print("❌ Cannot check indexes: database connection not available")
+        return {}
+
+    report = {}
+    for collection_name, specs in INDEX_REGISTRY.items():
+        if collections and collection_name not in collections:
+            continue
+
+        existing = set(database[collection_name].index_information()) - {'_id_'}
+        registered = {spec['name'] for spec in specs}
+        report[collection_name] = {
+            'missing': sorted(registered - existing),
+            'unregistered': sorted(existing - registered)
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the registered MongoDB indexes")
+    parser.add_argument('--collection', action='append', help="Limit to this collection (repeatable)")
+    parser.add_argument('--check', action='store_true', help="Only report missing and unregistered indexes")
+    args = parser.parse_args()
+
+    if args.check:
+        for collection_name, result in check_indexes(collections=args.collection).items():
+            print(f"{collection_name}: missing {result['missing'] or '-'}, unregistered {result['unregistered'] or '-'}")
+        return
+
+    report = ensure_indexes(collections=args.collection)
+    for collection_name, results in report.items():
+        for result in results:
+            print(f"{collection_name}.{result['name']}: {result['status']}")
+
+if __name__ == '__main__':
+    main()
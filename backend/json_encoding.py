@@ -0,0 +1,66 @@
+import json
+import uuid
+import decimal
+import datetime
+from bson.objectid import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def default(obj):
+    """Convert the non-JSON types our documents carry; shared by the orjson and stdlib paths"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if numpy is not None:
+        # pandas hands back NumPy scalars (e.g. numpy.int64 from value_counts)
+        if isinstance(obj, numpy.generic):
+            return obj.item()
+        if isinstance(obj, numpy.ndarray):
+            return obj.tolist()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj, indent=False):
+    """Serialize to UTF-8 JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=options)
+    return json.dumps(obj, default=default, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+def dumps(obj, indent=False):
+    """Serialize to a JSON string"""
+    return dumps_bytes(obj, indent).decode('utf-8')
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by dumps_bytes, so jsonify understands ObjectId, datetime and NumPy values"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Skip the bytes -> str -> bytes round trip of the base implementation
+        return self._app.response_class(dumps_bytes(obj), mimetype='application/json')
@@ -0,0 +1,166 @@
+import time
+import smtplib
+import datetime
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from pymongo import ReturnDocument
+
+from config import (
+    db, SMTP_EMAIL, SMTP_PASSWORD, SMTP_SERVER, SMTP_PORT, SMTP_USE_TLS,
+    EMAIL_OUTBOX_COLLECTION, EMAIL_OUTBOX_BATCH_SIZE, EMAIL_OUTBOX_POLL_SECONDS,
+    EMAIL_OUTBOX_MAX_ATTEMPTS, EMAIL_OUTBOX_BACKOFF_SECONDS, EMAIL_OUTBOX_IDLE_DISCONNECT_SECONDS
+)
+
+EMAIL_STATUS_PENDING = 'pending'
+EMAIL_STATUS_SENDING = 'sending'
+EMAIL_STATUS_SENT = 'sent'
+EMAIL_STATUS_FAILED = 'failed'
+
+# A claimed email not finished within this window is assumed lost with its worker
+CLAIM_TIMEOUT_SECONDS = 600
+
+class EmailOutbox:
+    """Persisted email queue drained by a background worker over one reused SMTP connection"""
+
+    def __init__(self, database=None):
+        self.database = database if database is not None else db
+        self._smtp = None
+        self._last_used = 0.0
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def enqueue(self, to, subject, html):
+        """Queue an email for delivery; returns immediately"""
+        if self.database is None:
+            print("❌ Email outbox unavailable: database connection not available")
+            return None
+
+        now = datetime.datetime.utcnow()
+        result = self.database[EMAIL_OUTBOX_COLLECTION].insert_one({
+            'to': to,
+            'subject': subject,
+            'html': html,
+            'status': EMAIL_STATUS_PENDING,
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now,
+            'last_error': None
+        })
+        self._wakeup.set()
+        return result.inserted_id
+
+    def start_worker(self):
+        """Start the background thread that drains the outbox"""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._worker.start()
+        return self._worker
+
+    def drain_once(self):
+        """Claim and send one batch of due emails; returns the number of emails processed"""
+        batch = self._claim_batch()
+        for email in batch:
+            try:
+                self._send(email)
+                self._mark_sent(email)
+            except Exception as e:
+                # Drop the connection so the next send starts from a fresh, authenticated one
+                self._disconnect()
+                self._mark_retry(email, e)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            try:
+                processed = self.drain_once()
+            except Exception as e:
+                print(f"❌ Email outbox worker error: {e}")
+                processed = 0
+
+            if processed:
+                continue
+
+            if self._smtp is not None and time.monotonic() - self._last_used > EMAIL_OUTBOX_IDLE_DISCONNECT_SECONDS:
+                self._disconnect()
+
+            self._wakeup.wait(EMAIL_OUTBOX_POLL_SECONDS)
+            self._wakeup.clear()
+
+    def _claim_batch(self):
+        if self.database is None:
+            return []
+
+        now = datetime.datetime.utcnow()
+        due = {'$or': [
+            {'status': EMAIL_STATUS_PENDING, 'next_attempt_at': {'$lte': now}},
+            {'status': EMAIL_STATUS_SENDING, 'claimed_at': {'$lt': now - datetime.timedelta(seconds=CLAIM_TIMEOUT_SECONDS)}}
+        ]}
+
+        batch = []
+        while len(batch) < EMAIL_OUTBOX_BATCH_SIZE:
+            # Atomic claim, so several worker processes never send the same email
+            email = self.database[EMAIL_OUTBOX_COLLECTION].find_one_and_update(
+                due,
+                {'$set': {'status': EMAIL_STATUS_SENDING, 'claimed_at': now}, '$inc': {'attempts': 1}},
+                sort=[('next_attempt_at', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if email is None:
+                break
+            batch.append(email)
+        return batch
+
+    def _get_connection(self):
+        if self._smtp is None:
+            smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+            if SMTP_USE_TLS:
+                smtp.starttls()
+            if SMTP_EMAIL and SMTP_PASSWORD:
+                smtp.login(SMTP_EMAIL, SMTP_PASSWORD)
+            self._smtp = smtp
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+    def _send(self, email):
+        msg = MIMEMultipart()
+        msg['Subject'] = email['subject']
+        msg['From'] = SMTP_EMAIL
+        msg['To'] = email['to']
+        msg.attach(MIMEText(email['html'], 'html'))
+
+        self._get_connection().sendmail(SMTP_EMAIL, email['to'], msg.as_string())
+        self._last_used = time.monotonic()
+
+    def _mark_sent(self, email):
+        self.database[EMAIL_OUTBOX_COLLECTION].update_one(
+            {'_id': email['_id']},
+            {'$set': {'status': EMAIL_STATUS_SENT, 'sent_at': datetime.datetime.utcnow(), 'last_error': None}}
+        )
+        print(f"✅ Email '{email['subject']}' sent to {email['to']}")
+
+    def _mark_retry(self, email, error):
+        if email['attempts'] >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+            update = {'status': EMAIL_STATUS_FAILED, 'last_error': str(error)}
+            print(f"❌ Giving up on email to {email['to']} after {email['attempts']} attempts: {error}")
+        else:
+            # Exponential backoff: base, 2x base, 4x base, ...
+            delay = EMAIL_OUTBOX_BACKOFF_SECONDS * (2 ** (email['attempts'] - 1))
+            update = {
+                'status': EMAIL_STATUS_PENDING,
+                'next_attempt_at': datetime.datetime.utcnow() + datetime.timedelta(seconds=delay),
+                'last_error': str(error)
+            }
+            print(f"❌ Email to {email['to']} failed (attempt {email['attempts']}), retrying in {delay}s: {error}")
+
+        self.database[EMAIL_OUTBOX_COLLECTION].update_one({'_id': email['_id']}, {'$set': update})
+
+email_outbox = EmailOutbox()
@@ -0,0 +1,95 @@
+import argparse
+from pymongo import UpdateOne
+
+from config import db, RESOURCES_COLLECTION, SEARCH_SHADOW_FIELDS
+from utils import cost_fields, search_shadow_value, search_shadow_pending
+from write_generation import WriteGeneration, resource_generation
+
+DEFAULT_BATCH_SIZE = 1000
+
+def run_backfill(name, collection_name, pending_query, projection, compute_fields, database=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Set compute_fields(document) on every document matching pending_query, one batch at a time.
+
+    pending_query must stop matching a document once it is backfilled, which makes the backfill
+    resumable: rerunning after an interruption picks up exactly the documents still pending.
+    Within a run, each batch continues after the last _id of the previous one, so the _id index
+    is walked once instead of from the start for every batch.
+    """
+    database = database if database is not None else db
+    if database is None:
+        print(f"❌ Skipping {name} backfill: database connection not available")
+        return 0
+
+    collection = database[collection_name]
+    remaining = collection.count_documents(pending_query)
+    print(f"🔄 {name}: {remaining} documents to backfill")
+
+    updated = 0
+    last_id = None
+    while True:
+        query = pending_query if last_id is None else {'$and': [pending_query, {'_id': {'$gt': last_id}}]}
+        batch = list(collection.find(query, projection).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+
+        operations = [UpdateOne({'_id': document['_id']}, {'$set': compute_fields(document)}) for document in batch]
+        collection.bulk_write(operations, ordered=False)
+        updated += len(batch)
+        print(f"⏳ {name}: {updated}/{remaining}")
+
+    print(f"✅ {name}: backfilled {updated} documents")
+    return updated
+
+def backfill_search_shadows(database=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Add the lowercase search shadow fields to resources written before they existed, and trim
+    the ones written before shadows were trimmed"""
+    def compute_fields(resource):
+        # Missing source fields get an empty shadow so the document stops matching pending_query
+        return {shadow: search_shadow_value(resource.get(field)) for field, shadow in SEARCH_SHADOW_FIELDS.items()}
+
+    return run_backfill(
+        'search shadows',
+        RESOURCES_COLLECTION,
+        {'$or': [clause for shadow in SEARCH_SHADOW_FIELDS.values() for clause in search_shadow_pending(shadow)]},
+        {field: 1 for field in SEARCH_SHADOW_FIELDS},
+        compute_fields,
+        database=database,
+        batch_size=batch_size
+    )
+
+def backfill_costs(database=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Store a numeric cost and is_cost_valid on resources written before costs were normalized.
+
+    Unparseable costs keep their original value in cost_raw.
+    """
+    updated = run_backfill(
+        'costs',
+        RESOURCES_COLLECTION,
+        {'is_cost_valid': {'$exists': False}},
+        {'cost': 1},
+        lambda resource: cost_fields(resource.get('cost')),
+        database=database,
+        batch_size=batch_size
+    )
+    if updated:
+        # Cost statistics (and their ETag) are derived from the resources generation
+        generation = resource_generation if database is None else WriteGeneration(RESOURCES_COLLECTION, database=database)
+        generation.bump()
+    return updated
+
+BACKFILLS = {
+    'search-shadows': backfill_search_shadows,
+    'costs': backfill_costs,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run data backfills against the configured database")
+    parser.add_argument('backfill', choices=sorted(BACKFILLS))
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    BACKFILLS[args.backfill](batch_size=args.batch_size)
+
+if __name__ == '__main__':
+    main()
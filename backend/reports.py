@@ -1,6 +1,7 @@
 import datetime
 import io
 import os
+import json
 import textwrap
 from collections import defaultdict
 from dotenv import load_dotenv
@@ -300,9 +301,19 @@ class ReportService:
             stats_response.raise_for_status()
             self.stats_data = stats_response.json().get('data', {})
             
-            resources_response = requests.get(f"{self.api_base_url}/api/resources?limit=5000", headers=self.headers)
+            # Streamed as NDJSON: one resource per line, then a pagination line
+            resources_response = requests.get(
+                f"{self.api_base_url}/api/resources?limit=5000",
+                headers={**self.headers, 'Accept': 'application/x-ndjson'},
+                stream=True
+            )
             resources_response.raise_for_status()
-            self.all_resources_data = resources_response.json().get('resources', [])
+            self.all_resources_data = []
+            for line in resources_response.iter_lines():
+                if line:
+                    record = json.loads(line)
+                    if 'pagination' not in record:
+                        self.all_resources_data.append(record)
             
             print(f"Fetched {len(self.all_resources_data)} resources")
             print(f"Stats data keys: {list(self.stats_data.keys()) if self.stats_data else 'None'}")
@@ -1,27 +1,46 @@
 import datetime
 import jwt
 import uuid
-import smtplib
 import pandas as pd
 import io
 import re
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from flask import jsonify, send_file
+import hashlib
+from flask import jsonify, send_file, Response
 from bson.objectid import ObjectId
 from bson.errors import InvalidId
+from pymongo import ReturnDocument, InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
 import requests
 import json
 from dotenv import load_dotenv
 from config import (
     db, ADMIN_ROLE, VIEWER_ROLE, JWT_SECRET, GROQ_API_KEY, 
-    SMTP_EMAIL, SMTP_PASSWORD, MASTER_EMAIL, SMTP_SERVER, SMTP_PORT,
+    SMTP_EMAIL, SMTP_PASSWORD, MASTER_EMAIL,
     USER_STATUS_PENDING, USER_STATUS_APPROVED, USER_STATUS_REJECTED,
     RESOURCE_REQUIRED_FIELDS, CSV_COLUMN_MAPPING,
-    USERS_COLLECTION, RESOURCES_COLLECTION, SESSIONS_COLLECTION, CHAT_HISTORY_COLLECTION
+    USERS_COLLECTION, RESOURCES_COLLECTION, SESSIONS_COLLECTION, CHAT_HISTORY_COLLECTION,
+    COUNT_MODES, COUNT_MODE_EXACT, COUNT_MODE_ESTIMATED, COUNT_MODE_CACHED, RESOURCE_COUNT_MODE,
+    COUNT_CACHE_MAX_SIZE, COUNT_CACHE_TTL_SECONDS, RESOURCE_PROJECTABLE_FIELDS,
+    SEARCH_MODES, SEARCH_MODE_TEXT, SEARCH_MODE_FUZZY, RESOURCE_SEARCH_MODE, SUGGEST_MAX_RESULTS,
+    FUZZY_MAX_CANDIDATES, MATCH_MODES, MATCH_CONTAINS, MATCH_PREFIX, MATCH_EXACT, SEARCH_SHADOW_FIELDS,
+    BATCH_GET_MAX_IDS, BULK_MAX_OPERATIONS, IMPORT_MODES, IMPORT_MODE_INSERT, IMPORT_MODE_UPSERT, UPLOAD_IMPORT_MODE,
+    IMPORT_KEYS, UPLOAD_IMPORT_KEY, IMPORT_BATCH_SIZE, RESOURCE_STREAM_BATCH_SIZE
 )
 from firebase_admin import auth as firebase_auth
-from utils import format_response, validate_email, get_user_from_token
+from utils import (
+    format_response, validate_email, get_current_user, invalidate_cached_session, revoke_token,
+    log_rate_limited, encode_cursor, keyset_query, parse_projection, cost_fields,
+    search_shadow_value, search_shadow_pending
+)
+from firebase_tokens import verify_firebase_id_token
+from mailer import email_outbox
+from user_directory import user_directory
+from write_generation import resource_generation
+from cache import TTLCache
+from indexes import resource_listing_hint
+import json_encoding
+from suggestions import resource_suggestions
+from fuzzy_index import resource_fuzzy_index
 load_dotenv()
 # Check if Firebase is initialized
 try:
@@ -47,7 +66,7 @@ class AuthService:
                 return format_response(error="Invalid email format", status=400)
             
             # Check if user already exists
-            existing_user = db[USERS_COLLECTION].find_one({'email': email})
+            existing_user = user_directory.get_by_email(email)
             if existing_user:
                 return format_response(error="User already exists", status=409)
             
@@ -82,6 +101,7 @@ class AuthService:
                     
                     print(f"🔍 REGISTER DEBUG: Creating user document: {user_doc}")
                     db[USERS_COLLECTION].insert_one(user_doc)
+                    user_directory.put(user_doc)
             
             # Send admin verification email if admin role
             if role == ADMIN_ROLE:
@@ -98,7 +118,7 @@ class AuthService:
 
     
     def send_admin_verification_email(self, admin_email, admin_name):
-        """Send verification email to master admin"""
+        """Queue verification email to master admin"""
         try:
             if not SMTP_EMAIL or not SMTP_PASSWORD or not MASTER_EMAIL:
                 print("Email configuration not complete, skipping email")
@@ -106,11 +126,6 @@ class AuthService:
             
             approval_link = f"https://campus-back-production.up.railway.app/admin-verify?email={admin_email}"
             
-            msg = MIMEMultipart()
-            msg['Subject'] = 'New Admin Account Verification Required'
-            msg['From'] = SMTP_EMAIL
-            msg['To'] = MASTER_EMAIL
-            
             body = f"""
             <html>
             <body>
@@ -134,18 +149,45 @@ class AuthService:
             </html>
             """
             
-            msg.attach(MIMEText(body, 'html'))
+            # Delivered by the outbox worker so registration doesn't wait on SMTP
+            email_outbox.enqueue(MASTER_EMAIL, 'New Admin Account Verification Required', body)
+            
+            print(f"✅ Admin verification email queued for {admin_email}")
+            
+        except Exception as e:
+            print(f"❌ Failed to queue admin verification email: {e}")
+    
+    def send_approval_notification(self, admin_email, admin_name, approved=True):
+        """Queue approval/rejection notification email to the admin applicant"""
+        try:
+            if not SMTP_EMAIL or not SMTP_PASSWORD:
+                print("Email configuration not complete, skipping email")
+                return
+            
+            if approved:
+                subject = 'Your Admin Account Has Been Approved'
+                status_text = 'approved. You can now log in with admin access'
+            else:
+                subject = 'Your Admin Account Request Was Rejected'
+                status_text = 'rejected. Please contact the master admin for details'
+            
+            body = f"""
+            <html>
+            <body>
+                <h2>{subject}</h2>
+                <p>Hello {admin_name or admin_email},</p>
+                <p>Your admin account request for Campus Assets Management has been {status_text}.</p>
+                <p><strong>Decision Date:</strong> {datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC</p>
+            </body>
+            </html>
+            """
             
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            server.starttls()
-            server.login(SMTP_EMAIL, SMTP_PASSWORD)
-            server.sendmail(SMTP_EMAIL, MASTER_EMAIL, msg.as_string())
-            server.quit()
+            email_outbox.enqueue(admin_email, subject, body)
             
-            print(f"✅ Admin verification email sent for {admin_email}")
+            print(f"✅ Approval notification queued for {admin_email}")
             
         except Exception as e:
-            print(f"❌ Failed to send admin verification email: {e}")
+            print(f"❌ Failed to queue approval notification: {e}")
     
     def login_user(self, data):
         """Login user with Firebase token or mock token with fallback logic"""
@@ -168,17 +210,16 @@ class AuthService:
                 print(f"🔍 LOGIN DEBUG: Extracted email: {email}")
                 print(f"🔍 LOGIN DEBUG: Generated mock UID: {mock_uid}")
                 
-                # ENHANCED LOGIC: Try multiple approaches to find the user
-                user = None
-                
-                # 1. First try with mock UID
-                print(f"🔍 LOGIN DEBUG: Trying to find user with mock UID: {mock_uid}")
-                user = db[USERS_COLLECTION].find_one({'firebase_uid': mock_uid})
+                # ENHANCED LOGIC: Look up by mock UID or email in one indexed query,
+                # preferring the mock UID match
+                print(f"🔍 LOGIN DEBUG: Looking up user by mock UID {mock_uid} or email {email}")
+                candidates = list(db[USERS_COLLECTION].find(
+                    {'$or': [{'firebase_uid': mock_uid}, {'email': email}]}
+                ).limit(2))
+                user = next((u for u in candidates if u.get('firebase_uid') == mock_uid), None)
                 
                 if not user:
-                    print(f"🔍 LOGIN DEBUG: Mock UID not found, trying by email: {email}")
-                    # 2. If mock UID fails, try to find by email
-                    user = db[USERS_COLLECTION].find_one({'email': email})
+                    user = candidates[0] if candidates else None
                     
                     if user:
                         print(f"✅ LOGIN DEBUG: Found user by email!")
@@ -186,12 +227,7 @@ class AuthService:
                         
                         # 3. Update the user's firebase_uid to the mock UID for consistency
                         print(f"🔄 LOGIN DEBUG: Updating user's firebase_uid to mock UID for consistency")
-                        db[USERS_COLLECTION].update_one(
-                            {'email': email},
-                            {'$set': {'firebase_uid': mock_uid}}
-                        )
-                        # Update the user object to reflect the change
-                        user['firebase_uid'] = mock_uid
+                        user = user_directory.update(user, {'firebase_uid': mock_uid})
                         print(f"✅ LOGIN DEBUG: Updated firebase_uid to: {mock_uid}")
                     else:
                         print(f"❌ LOGIN DEBUG: No user found with email: {email}")
@@ -204,7 +240,7 @@ class AuthService:
                 # Try to verify with Firebase
                 try:
                     if firebase_initialized:
-                        decoded_token = firebase_auth.verify_id_token(id_token)
+                        decoded_token = verify_firebase_id_token(id_token)
                         uid = decoded_token['uid']
                         email = decoded_token.get('email')
                         print(f"🔍 LOGIN DEBUG: Using Firebase authentication")
@@ -212,7 +248,7 @@ class AuthService:
                         print(f"🔍 LOGIN DEBUG: Firebase email: {email}")
                         
                         # Try to find user with Firebase UID
-                        user = db[USERS_COLLECTION].find_one({'firebase_uid': uid})
+                        user = user_directory.get_by_uid(uid)
                     else:
                         print(f"❌ LOGIN DEBUG: Firebase not initialized")
                         return format_response(error="Firebase not initialized", status=500)
@@ -222,14 +258,10 @@ class AuthService:
             
             # Final check if user was found
             if not user:
-                print(f"❌ LOGIN DEBUG: No user found after all attempts")
-                
-                # Debug: Show all users again
-                all_users = list(db[USERS_COLLECTION].find({}, {'email': 1, 'firebase_uid': 1, 'status': 1, 'role': 1}))
-                print(f"🔍 LOGIN DEBUG: All users in database:")
-                for u in all_users:
-                    print(f"  - Email: {u.get('email')}, UID: {u.get('firebase_uid')}, Status: {u.get('status')}, Role: {u.get('role')}")
-                
+                log_rate_limited(
+                    'login_user_not_found',
+                    f"event=login_user_not_found email={email} uid={uid}"
+                )
                 return format_response(error="User not found", status=404)
             
             print(f"✅ LOGIN DEBUG: Found user: {user.get('email')}")
@@ -244,11 +276,14 @@ class AuthService:
             
             # Create session token using the actual UID from database
             actual_uid = user['firebase_uid']
+            expires_at = datetime.datetime.utcnow() + datetime.timedelta(hours=8)
+            jti = uuid.uuid4().hex
             session_data = {
                 'uid': actual_uid,
                 'email': user['email'],
                 'role': user['role'],
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=8)
+                'jti': jti,
+                'exp': expires_at
             }
             session_token = jwt.encode(session_data, JWT_SECRET, algorithm='HS256')
             
@@ -256,17 +291,15 @@ class AuthService:
             session_doc = {
                 'user_id': actual_uid,
                 'session_token': session_token,
-                'expires_at': datetime.datetime.utcnow() + datetime.timedelta(hours=8),
+                'jti': jti,
+                'expires_at': expires_at,
                 'created_at': datetime.datetime.utcnow(),
                 'ip_address': None
             }
             db[SESSIONS_COLLECTION].insert_one(session_doc)
             
             # Update last login
-            db[USERS_COLLECTION].update_one(
-                {'firebase_uid': actual_uid},
-                {'$set': {'last_login': datetime.datetime.utcnow()}}
-            )
+            user_directory.update(user, {'last_login': datetime.datetime.utcnow()})
             
             print(f"✅ LOGIN DEBUG: Login successful for user: {user.get('email')}")
             
@@ -296,18 +329,15 @@ class AuthService:
             # For simplicity, token is email
             email = token
             
-            user = db[USERS_COLLECTION].find_one({'email': email, 'role': ADMIN_ROLE})
-            if not user:
+            user = user_directory.get_by_email(email)
+            if not user or user.get('role') != ADMIN_ROLE:
                 return format_response(error="Admin user not found", status=404)
             
             if user['status'] == USER_STATUS_APPROVED:
                 return format_response(message="Admin already approved", status=200)
             
             # Update user status
-            db[USERS_COLLECTION].update_one(
-                {'email': email},
-                {'$set': {'status': USER_STATUS_APPROVED}}
-            )
+            user_directory.update(user, {'status': USER_STATUS_APPROVED})
             
             return format_response(message="Admin approved successfully", status=200)
             
@@ -323,8 +353,14 @@ class AuthService:
             
             session_token = auth_header.split(' ')[1]
             
-            # Remove session from database
+            # Remove session from database and from every worker's session cache
             result = db[SESSIONS_COLLECTION].delete_one({'session_token': session_token})
+            invalidate_cached_session(session_token)
+            
+            # Stateless sessions are only rejected once their jti is on the denylist
+            user_data = get_current_user(request)
+            if user_data and user_data.get('jti'):
+                revoke_token(user_data['jti'], datetime.datetime.utcfromtimestamp(user_data['exp']))
             
             if result.deleted_count == 0:
                 return format_response(error="Session not found", status=404)
@@ -334,14 +370,41 @@ class AuthService:
         except Exception as e:
             return format_response(error=f"Logout failed: {str(e)}", status=400)
     
+    def revoke_user_sessions(self, uid):
+        """Revoke every active session of a user (admin action)"""
+        try:
+            if db is None:
+                return format_response(error="Database connection not available", status=500)
+            
+            sessions = list(db[SESSIONS_COLLECTION].find(
+                {'user_id': uid},
+                {'session_token': 1, 'jti': 1, 'expires_at': 1}
+            ))
+            
+            for session in sessions:
+                if session.get('jti'):
+                    revoke_token(session['jti'], session['expires_at'])
+                invalidate_cached_session(session['session_token'])
+            
+            db[SESSIONS_COLLECTION].delete_many({'user_id': uid})
+            
+            return format_response(
+                data={'uid': uid, 'revoked_sessions': len(sessions)},
+                message=f"Revoked {len(sessions)} session(s)",
+                status=200
+            )
+            
+        except Exception as e:
+            return format_response(error=f"Session revocation failed: {str(e)}", status=400)
+    
     def get_user_profile(self, request):
         """Get user profile information"""
         try:
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
             if not user_data:
                 return format_response(error="Invalid session", status=401)
             
-            user = db[USERS_COLLECTION].find_one({'firebase_uid': user_data['uid']})
+            user = user_directory.get_by_uid(user_data['uid'])
             if not user:
                 return format_response(error="User not found", status=404)
             
@@ -351,8 +414,8 @@ class AuthService:
                 'name': user.get('name', ''),
                 'role': user['role'],
                 'status': user['status'],
-                'created_at': user['created_at'].isoformat(),
-                'last_login': user['last_login'].isoformat() if user['last_login'] else None
+                'created_at': user['created_at'],
+                'last_login': user['last_login']
             }
             
             return format_response(data=profile_data, status=200)
@@ -369,25 +432,239 @@ from bson.objectid import ObjectId
 # from utils import format_response, get_user_from_token
 # RESOURCE_REQUIRED_FIELDS = [...]
 
+# Normalized filter hash -> (resources write generation, count)
+_resource_count_cache = TTLCache(max_size=COUNT_CACHE_MAX_SIZE)
+
+# Relevance score projected and sorted on by text searches
+TEXT_SCORE = {'$meta': 'textScore'}
+
+RESOURCE_DATE_FIELDS = ['created_at', 'updated_at']
+# Listing fields coerced to a fixed type, with the default used when a document lacks them
+RESOURCE_LIST_FIELD_TYPES = {
+    'sl_no': (str, ''),
+    'description': (str, ''),
+    'service_tag': (str, ''),
+    'identification_number': (str, ''),
+    'procurement_date': (str, ''),
+    'location': (str, ''),
+    'department': (str, ''),
+    'parent_department': (str, ''),
+    'cost': (float, 0.0)
+}
+
+# Keeps the shadow fields out of full-document reads
+SEARCH_SHADOW_EXCLUSION = {shadow_field: 0 for shadow_field in SEARCH_SHADOW_FIELDS.values()}
+
+def with_search_shadows(fields):
+    """Copy of a resource document or $set payload with the lowercase shadows of its searchable fields"""
+    shadowed = dict(fields)
+    for field, shadow_field in SEARCH_SHADOW_FIELDS.items():
+        if field in fields:
+            shadowed[shadow_field] = search_shadow_value(fields[field])
+    return shadowed
+
+# Fields that make up any import key; changing one detaches a resource from its key
+IMPORT_KEY_FIELDS = {field for fields in IMPORT_KEYS.values() for field in fields}
+
+def stale_cost_raw(fields):
+    """$unset for the cost_raw of a previous invalid cost, when fields set a valid one"""
+    return {'cost_raw': ''} if fields.get('is_cost_valid') else {}
+
+def resource_update(fields):
+    """Update document setting fields and their shadows, dropping a now-stale import_key or cost_raw"""
+    update = {'$set': with_search_shadows(fields)}
+    unset = stale_cost_raw(fields)
+    if IMPORT_KEY_FIELDS & fields.keys():
+        # The next upsert import re-attaches it through the natural key
+        unset['import_key'] = ''
+    if unset:
+        update['$unset'] = unset
+    return update
+
+# Key values that mean "no value" (str() of an empty pandas cell gives 'nan')
+MISSING_KEY_VALUES = {'', 'nan', 'none', 'null', '-', '---', 'n/a'}
+
+def resource_import_key(key_name, resource):
+    """Normalized import key of a resource, or None when a key field is empty"""
+    values = [search_shadow_value(resource.get(field)) for field in IMPORT_KEYS[key_name]]
+    if any(value in MISSING_KEY_VALUES for value in values):
+        return None
+    return f"{key_name}:" + '|'.join(values)
+
+def build_match_clauses(search, match, contains_fields):
+    """$or clauses for a regex-mode search with the given match= semantics"""
+    if match == MATCH_EXACT:
+        return [{shadow_field: search.lower()} for shadow_field in SEARCH_SHADOW_FIELDS.values()]
+    if match == MATCH_PREFIX:
+        # Anchored and case-sensitive on lowercase data, so each clause is an index range scan
+        pattern = '^' + re.escape(search.lower())
+        return [{shadow_field: {'$regex': pattern}} for shadow_field in SEARCH_SHADOW_FIELDS.values()]
+    pattern = re.escape(search)
+    return [{field: {'$regex': pattern, '$options': 'i'}} for field in contains_fields]
+
+def iso_date_expression(field):
+    """Aggregation expression rendering a date field like datetime.isoformat(); other values pass through"""
+    path = '$' + field
+    return {'$cond': [
+        {'$eq': [{'$type': path}, 'date']},
+        # isoformat() omits the fraction when it is zero, and BSON dates carry milliseconds only
+        {'$cond': [
+            {'$eq': [{'$millisecond': path}, 0]},
+            {'$dateToString': {'format': '%Y-%m-%dT%H:%M:%S', 'date': path}},
+            {'$dateToString': {'format': '%Y-%m-%dT%H:%M:%S.%L000', 'date': path}}
+        ]},
+        path
+    ]}
+
+def resource_normalization_stage(projection=None):
+    """$addFields stage that makes listing documents ready to serialize, for the requested fields only.
+
+    Also exposes the raw created_at and _id as _cursor_created_at/_cursor_id for the keyset cursor.
+    """
+    stage = {
+        '_cursor_created_at': '$created_at',
+        '_cursor_id': '$_id',
+        '_id': {'$toString': '$_id'}
+    }
+    for date_field in RESOURCE_DATE_FIELDS:
+        if projection is None or date_field in projection:
+            stage[date_field] = iso_date_expression(date_field)
+
+    for field, (field_type, default) in RESOURCE_LIST_FIELD_TYPES.items():
+        if projection is not None and field not in projection:
+            continue
+        # $convert with onError, so one malformed value (e.g. an array) can't fail the whole page
+        stage[field] = {'$convert': {
+            'input': '$' + field,
+            'to': 'double' if field_type is float else 'string',
+            'onError': default,
+            'onNull': default
+        }}
+    return {'$addFields': stage}
+
+# Stored fields that are not part of the export format
+EXPORT_EXCLUDED_FIELDS = ['_id', 'created_at', 'updated_at', 'created_by', 'is_cost_valid', 'cost_raw', 'import_key']
+
+def export_dataframe(resources):
+    """DataFrame of resources in the export format; invalid costs are written as their original value"""
+    df = pd.DataFrame(resources)
+    if 'is_cost_valid' in df:
+        invalid = df['is_cost_valid'] == False
+        raw = df['cost_raw'] if 'cost_raw' in df else pd.Series('', index=df.index)
+        df['cost'] = df['cost'].astype(object).where(~invalid, raw.fillna(''))
+    
+    # Remove MongoDB-specific and internal fields, so a re-import of the file stays clean
+    df.drop(columns=EXPORT_EXCLUDED_FIELDS, inplace=True, errors='ignore')
+    return df
+
+BULK_INSERT = 'insert'
+BULK_UPDATE = 'update'
+BULK_DELETE = 'delete'
+BULK_OPERATIONS = [BULK_INSERT, BULK_UPDATE, BULK_DELETE]
+
 class ResourceService:
 
-    def get_resources(self, filters, page=1, limit=10):
-        """Get resources with enhanced filtering, pagination, and sorting."""
+    def _new_resource_document(self, data, user_email):
+        """Resource document for a create"""
+        now = datetime.datetime.utcnow()
+        return {
+            'sl_no': data['sl_no'],
+            'description': data['description'],
+            'service_tag': data['service_tag'],
+            'identification_number': data['identification_number'],
+            'procurement_date': data['procurement_date'],
+            **cost_fields(data['cost'], strict=True),
+            'location': data['location'],
+            'department': data['department'],
+            'parent_department': data.get('parent_department', ''), # Add new field
+            'created_by': user_email,
+            'created_at': now,
+            'updated_at': now,
+            'updated_by': user_email
+        }
+
+    def _resource_update_fields(self, data, user_email):
+        """$set fields for an update, excluding empty values"""
+        update_data = {k: v for k, v in data.items() if v is not None and v != ''}
+        update_data.pop('is_cost_valid', None)
+        update_data.pop('cost_raw', None)
+        update_data.pop('import_key', None)
+        
+        if 'cost' in update_data:
+            update_data.update(cost_fields(update_data['cost'], strict=True))
+        
+        update_data['updated_at'] = datetime.datetime.utcnow()
+        update_data['updated_by'] = user_email
+        return update_data
+
+    def _count_resources(self, query, mode):
+        """Count resources matching query; returns (total, count mode actually used)"""
+        if mode == COUNT_MODE_ESTIMATED and not query:
+            # Reads collection metadata instead of scanning
+            return db[RESOURCES_COLLECTION].estimated_document_count(), COUNT_MODE_ESTIMATED
+
+        hint = resource_listing_hint(query)
+        count_options = {'hint': hint} if hint else {}
+
+        if mode == COUNT_MODE_CACHED:
+            normalized = json.dumps(query, sort_keys=True, default=str)
+            key = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+            # Read the generation first, so a write racing the count invalidates it
+            generation = resource_generation.current()
+            cached = _resource_count_cache.get(key)
+            if cached is not None and cached[0] == generation:
+                return cached[1], COUNT_MODE_CACHED
+
+            total = db[RESOURCES_COLLECTION].count_documents(query, **count_options)
+            _resource_count_cache.set(key, (generation, total), COUNT_CACHE_TTL_SECONDS)
+            return total, COUNT_MODE_CACHED
+
+        # Exact, and the fallback for estimated counts of filtered listings
+        return db[RESOURCES_COLLECTION].count_documents(query, **count_options), COUNT_MODE_EXACT
+
+    def get_resources(self, filters, page=1, limit=10, cursor=None, count_mode=None, fields=None, stream=False):
+        """Get resources with enhanced filtering, pagination, and sorting.
+
+        Pass the previous response's next_cursor as cursor for keyset paging, whose cost
+        does not grow with depth; page is kept for offset-based clients. count_mode is one
+        of COUNT_MODES and defaults to RESOURCE_COUNT_MODE. fields limits the returned fields.
+        With stream, the page is written as NDJSON while it is read (see _stream_resources).
+        """
+        count_mode = (count_mode or RESOURCE_COUNT_MODE).lower()
+        if count_mode not in COUNT_MODES:
+            return format_response(error=f"Invalid count_mode, expected one of: {', '.join(COUNT_MODES)}", status=400)
+        try:
+            projection = parse_projection(fields, RESOURCE_PROJECTABLE_FIELDS)
+        except ValueError as e:
+            return format_response(error=str(e), status=400)
+        search_mode = (filters.get('search_mode') or RESOURCE_SEARCH_MODE).lower()
+        if search_mode not in SEARCH_MODES:
+            return format_response(error=f"Invalid search_mode, expected one of: {', '.join(SEARCH_MODES)}", status=400)
+        match = (filters.get('match') or MATCH_CONTAINS).lower()
+        if match not in MATCH_MODES:
+            return format_response(error=f"Invalid match, expected one of: {', '.join(MATCH_MODES)}", status=400)
+
         try:
             query = {}
 
             # Search functionality (added parent_department)
             search = filters.get('search', '').strip()
-            if search:
-                query['$or'] = [
-                    {'description': {'$regex': search, '$options': 'i'}},
-                    {'sl_no': {'$regex': search, '$options': 'i'}},
-                    {'service_tag': {'$regex': search, '$options': 'i'}},
-                    {'identification_number': {'$regex': search, '$options': 'i'}},
-                    {'location': {'$regex': search, '$options': 'i'}},
-                    {'department': {'$regex': search, '$options': 'i'}},
-                    {'parent_department': {'$regex': search, '$options': 'i'}}
-                ]
+            text_search = bool(search) and search_mode == SEARCH_MODE_TEXT
+            # None while the fuzzy index is still warming up; the regex search stands in
+            fuzzy_matches = None
+            if search and search_mode == SEARCH_MODE_FUZZY:
+                fuzzy_matches = resource_fuzzy_index.search(search, limit=FUZZY_MAX_CANDIDATES)
+            if text_search:
+                # Served by the text index; the filters below are ANDed with it
+                query['$text'] = {'$search': search}
+            elif fuzzy_matches is not None:
+                # Typo-tolerant matches narrow the listing, which keeps its usual order
+                query['_id'] = {'$in': [resource_id for resource_id, _ in fuzzy_matches]}
+            elif search:
+                query['$or'] = build_match_clauses(search, match, [
+                    'description', 'sl_no', 'service_tag', 'identification_number',
+                    'location', 'department', 'parent_department'
+                ])
 
             # Exact match filtering for dropdowns
             for field in ['location', 'department', 'parent_department']:
@@ -408,43 +685,71 @@ class ResourceService:
                 except (ValueError, TypeError):
                     pass # Ignore invalid number format
             if cost_query:
+                # Invalid costs are stored as a 0 placeholder, which is not a real zero cost
                 query['cost'] = cost_query
+                query['is_cost_valid'] = True
 
-            # Calculate pagination
-            skip = (page - 1) * limit
+            # Get total count before the cursor narrows the query; streams don't report one
+            if not stream:
+                total, count_mode = self._count_resources(query, count_mode)
+
+            # _id breaks created_at ties so every document has a unique position
+            sort = {'created_at': -1, '_id': -1}
+            if text_search:
+                if cursor:
+                    return format_response(error="Relevance-ranked search pages with page, not cursor", status=400)
+                # Most relevant first, newest first among equally relevant
+                sort = {'score': TEXT_SCORE, **sort}
 
-            # Get resources and total count
-            resources_cursor = db[RESOURCES_COLLECTION].find(query).sort('created_at', -1).skip(skip).limit(limit)
-            total = db[RESOURCES_COLLECTION].count_documents(query)
-            
-            resources = []
-            for resource in resources_cursor:
-                resource['_id'] = str(resource['_id'])
-                # Format dates and ensure all fields are present
-                for date_field in ['created_at', 'updated_at']:
-                    if date_field in resource and isinstance(resource[date_field], datetime.datetime):
-                        resource[date_field] = resource[date_field].isoformat()
-
-                # Ensure all fields exist and have correct types
-                resource['sl_no'] = str(resource.get('sl_no', ''))
-                resource['description'] = str(resource.get('description', ''))
-                resource['service_tag'] = str(resource.get('service_tag', ''))
-                resource['identification_number'] = str(resource.get('identification_number', ''))
-                resource['procurement_date'] = str(resource.get('procurement_date', ''))
-                resource['location'] = str(resource.get('location', ''))
-                resource['department'] = str(resource.get('department', ''))
-                resource['parent_department'] = str(resource.get('parent_department', ''))
-                resource['cost'] = float(resource.get('cost', 0.0))
-                resources.append(resource)
+            if cursor:
+                try:
+                    pipeline = [{'$match': keyset_query(query, cursor)}, {'$sort': sort}]
+                except ValueError as e:
+                    return format_response(error=str(e), status=400)
+            else:
+                pipeline = [{'$match': query}, {'$sort': sort}, {'$skip': (page - 1) * limit}]
+            pipeline.append({'$limit': limit + 1})
+
+            # The cursor needs created_at even when the client did not ask for it
+            pipeline.append({'$project': {**projection, 'created_at': 1} if projection else SEARCH_SHADOW_EXCLUSION})
+            if text_search:
+                pipeline.append({'$addFields': {'score': TEXT_SCORE}})
+            # Documents leave the server normalized, so no per-document work is left here
+            pipeline.append(resource_normalization_stage(projection))
+            if projection is not None and 'created_at' not in projection:
+                # Only fetched for the cursor
+                pipeline.append({'$project': {'created_at': 0}})
+
+            hint = resource_listing_hint(query)
+            aggregate_options = {'hint': hint} if hint else {}
+            if stream:
+                aggregate_options['batchSize'] = RESOURCE_STREAM_BATCH_SIZE
+                cursor_documents = db[RESOURCES_COLLECTION].aggregate(pipeline, **aggregate_options)
+                return self._stream_resources(cursor_documents, None if cursor else page, limit)
+            resources = list(db[RESOURCES_COLLECTION].aggregate(pipeline, **aggregate_options))
+
+            # One extra document tells us whether another page follows
+            has_more = len(resources) > limit
+            resources = resources[:limit]
+            next_cursor = None
+            if has_more:
+                last = resources[-1]
+                next_cursor = encode_cursor({'created_at': last.get('_cursor_created_at'), '_id': last['_cursor_id']})
+            for resource in resources:
+                del resource['_cursor_id']
+                resource.pop('_cursor_created_at', None)
 
             return format_response(
                 data={
                     'resources': resources,
                     'pagination': {
-                        'page': page,
+                        'page': None if cursor else page,
                         'limit': limit,
                         'total': total,
-                        'pages': (total + limit - 1) // limit if limit > 0 else 0
+                        'count_mode': count_mode,
+                        'pages': (total + limit - 1) // limit if limit > 0 else 0,
+                        'has_more': has_more,
+                        'next_cursor': next_cursor
                     }
                 },
                 status=200
@@ -454,6 +759,43 @@ class ResourceService:
             print(f"Error getting resources: {e}")
             return format_response(error=f"Failed to fetch resources: {str(e)}", status=500)
 
+    def _stream_resources(self, cursor_documents, page, limit):
+        """NDJSON response writing one resource per line as the cursor yields them.
+
+        Memory stays at one batch regardless of limit. A final {"pagination": {...}} line carries
+        has_more and next_cursor; a stream without it was cut short.
+        """
+        def generate():
+            chunk = []
+            sent = 0
+            last = None
+            has_more = False
+            try:
+                for resource in cursor_documents:
+                    if sent == limit:
+                        # The extra document only tells us another page follows
+                        has_more = True
+                        break
+                    last = {'created_at': resource.pop('_cursor_created_at', None), '_id': resource.pop('_cursor_id')}
+                    chunk.append(json_encoding.dumps_bytes(resource))
+                    sent += 1
+                    if len(chunk) == RESOURCE_STREAM_BATCH_SIZE:
+                        yield b'\n'.join(chunk) + b'\n'
+                        chunk = []
+
+                chunk.append(json_encoding.dumps_bytes({'pagination': {
+                    'page': page,
+                    'limit': limit,
+                    'returned': sent,
+                    'has_more': has_more,
+                    'next_cursor': encode_cursor(last) if has_more and last else None
+                }}))
+                yield b'\n'.join(chunk) + b'\n'
+            finally:
+                cursor_documents.close()
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
     def create_resource(self, data, request):
         """Create a new resource with parent_department."""
         try:
@@ -462,27 +804,14 @@ class ResourceService:
                 if field not in data or not data[field]:
                     return format_response(error=f"Missing required field: {field}", status=400)
             
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
             if not user_data:
                 return format_response(error="Invalid session", status=401)
 
-            resource_doc = {
-                'sl_no': data['sl_no'],
-                'description': data['description'],
-                'service_tag': data['service_tag'],
-                'identification_number': data['identification_number'],
-                'procurement_date': data['procurement_date'],
-                'cost': float(data['cost']),
-                'location': data['location'],
-                'department': data['department'],
-                'parent_department': data.get('parent_department', ''), # Add new field
-                'created_by': user_data['email'],
-                'created_at': datetime.datetime.utcnow(),
-                'updated_at': datetime.datetime.utcnow(),
-                'updated_by': user_data['email']
-            }
+            resource_doc = self._new_resource_document(data, user_data['email'])
             
-            result = db[RESOURCES_COLLECTION].insert_one(resource_doc)
+            result = db[RESOURCES_COLLECTION].insert_one(with_search_shadows(resource_doc))
+            resource_suggestions.add([resource_doc], resource_generation.bump())
             
             return format_response(
                 data={'resource_id': str(result.inserted_id)},
@@ -500,26 +829,23 @@ class ResourceService:
             if not ObjectId.is_valid(resource_id):
                 return format_response(error="Invalid resource ID", status=400)
             
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
             if not user_data:
                 return format_response(error="Invalid session", status=401)
             
-            # Prepare update data, excluding empty values
-            update_data = {k: v for k, v in data.items() if v is not None and v != ''}
-            
-            if 'cost' in update_data:
-                update_data['cost'] = float(update_data['cost'])
+            update_data = self._resource_update_fields(data, user_data['email'])
             
-            update_data['updated_at'] = datetime.datetime.utcnow()
-            update_data['updated_by'] = user_data['email']
-            
-            result = db[RESOURCES_COLLECTION].update_one(
+            # The previous version tells the suggestion index which values went away
+            before = db[RESOURCES_COLLECTION].find_one_and_update(
                 {'_id': ObjectId(resource_id)},
-                {'$set': update_data}
+                resource_update(update_data),
+                return_document=ReturnDocument.BEFORE
             )
+            generation = resource_generation.bump()
             
-            if result.matched_count == 0:
+            if before is None:
                 return format_response(error="Resource not found", status=404)
+            resource_suggestions.replace([before], [{**before, **update_data}], generation)
             
             return format_response(message="Resource updated successfully", status=200)
         except (ValueError, TypeError) as e:
@@ -530,42 +856,63 @@ class ResourceService:
 
     # Other functions (delete_resource, get_resource, dashboard_stats, etc.) remain largely the same.
     # Just ensure they handle the 'parent_department' field if they return resource objects.
-    def search_resources(self, query, filters):
+    def search_resources(self, query, filters, fields=None):
         """Enhanced search with multi-field support"""
         try:
+            try:
+                projection = parse_projection(fields, RESOURCE_PROJECTABLE_FIELDS)
+            except ValueError as e:
+                return format_response(error=str(e), status=400)
+            search_mode = (filters.get('search_mode') or RESOURCE_SEARCH_MODE).lower()
+            if search_mode not in SEARCH_MODES:
+                return format_response(error=f"Invalid search_mode, expected one of: {', '.join(SEARCH_MODES)}", status=400)
+            match = (filters.get('match') or MATCH_CONTAINS).lower()
+            if match not in MATCH_MODES:
+                return format_response(error=f"Invalid match, expected one of: {', '.join(MATCH_MODES)}", status=400)
+
             search_query = {}
-            
-            if query:
-                search_query['$or'] = [
-                    {'description': {'$regex': query, '$options': 'i'}},
-                    {'sl_no': {'$regex': query, '$options': 'i'}},
-                    {'service_tag': {'$regex': query, '$options': 'i'}},
-                    {'identification_number': {'$regex': query, '$options': 'i'}},
-                    {'location': {'$regex': query, '$options': 'i'}},
-                    {'section_location': {'$regex': query, '$options': 'i'}},
-                    {'product_category': {'$regex': query, '$options': 'i'}},
-                    {'department': {'$regex': query, '$options': 'i'}}
-                ]
-            
-            # Apply additional filters
+            text_search = bool(query) and search_mode == SEARCH_MODE_TEXT
+            fuzzy_scores = None
+            
+            if query and search_mode == SEARCH_MODE_FUZZY:
+                # None while the fuzzy index is still warming up; the regex search stands in
+                fuzzy_matches = resource_fuzzy_index.search(query, limit=50)
+                if fuzzy_matches is not None:
+                    fuzzy_scores = dict(fuzzy_matches)
+            
+            if text_search:
+                search_query['$text'] = {'$search': query}
+            elif fuzzy_scores is not None:
+                search_query['_id'] = {'$in': list(fuzzy_scores)}
+            elif query:
+                search_query['$or'] = build_match_clauses(query, match, [
+                    'description', 'sl_no', 'service_tag', 'identification_number',
+                    'location', 'section_location', 'product_category', 'department'
+                ])
+            
+            # Apply additional filters (escaped, so user input can't inject regex syntax)
             if 'location' in filters and filters['location']:
-                search_query['location'] = {'$regex': filters['location'], '$options': 'i'}
+                search_query['location'] = {'$regex': re.escape(filters['location']), '$options': 'i'}
             
             if 'department' in filters and filters['department']:
-                search_query['department'] = {'$regex': filters['department'], '$options': 'i'}
+                search_query['department'] = {'$regex': re.escape(filters['department']), '$options': 'i'}
             
             if 'product_category' in filters and filters['product_category']:
-                search_query['product_category'] = {'$regex': filters['product_category'], '$options': 'i'}
-            
-            resources = list(db[RESOURCES_COLLECTION].find(search_query).limit(50))
+                search_query['product_category'] = {'$regex': re.escape(filters['product_category']), '$options': 'i'}
             
-            # Convert ObjectId to string
-            for resource in resources:
-                resource['_id'] = str(resource['_id'])
-                if 'created_at' in resource:
-                    resource['created_at'] = resource['created_at'].isoformat()
-                if 'updated_at' in resource:
-                    resource['updated_at'] = resource['updated_at'].isoformat()
+            find_projection = projection or dict(SEARCH_SHADOW_EXCLUSION)
+            if text_search:
+                # Most relevant matches first
+                find_projection = {**find_projection, 'score': TEXT_SCORE}
+                resources_cursor = db[RESOURCES_COLLECTION].find(search_query, find_projection).sort([('score', TEXT_SCORE)])
+            else:
+                resources_cursor = db[RESOURCES_COLLECTION].find(search_query, find_projection)
+            resources = list(resources_cursor.limit(50))
+            if fuzzy_scores is not None:
+                # Most similar first
+                for resource in resources:
+                    resource['score'] = fuzzy_scores[resource['_id']]
+                resources.sort(key=lambda resource: resource['score'], reverse=True)
             
             return format_response(
                 data={
@@ -579,27 +926,76 @@ class ResourceService:
         except Exception as e:
             return format_response(error=f"Search failed: {str(e)}", status=400)
 
-    def get_resource(self, resource_id):
+    def suggest_resources(self, prefix, limit=10):
+        """Typeahead suggestions from the in-memory prefix index"""
+        try:
+            limit = max(1, min(limit, SUGGEST_MAX_RESULTS))
+            suggestions = resource_suggestions.suggest(prefix or '', limit)
+            return format_response(data={'query': prefix, 'suggestions': suggestions}, status=200)
+        except Exception as e:
+            return format_response(error=f"Suggestions failed: {str(e)}", status=400)
+
+    def get_resource(self, resource_id, fields=None):
         """Get a specific resource"""
         try:
             if not ObjectId.is_valid(resource_id):
                 return format_response(error="Invalid resource ID", status=400)
+            try:
+                projection = parse_projection(fields, RESOURCE_PROJECTABLE_FIELDS)
+            except ValueError as e:
+                return format_response(error=str(e), status=400)
             
-            resource = db[RESOURCES_COLLECTION].find_one({'_id': ObjectId(resource_id)})
+            resource = db[RESOURCES_COLLECTION].find_one({'_id': ObjectId(resource_id)}, projection or SEARCH_SHADOW_EXCLUSION)
             if not resource:
                 return format_response(error="Resource not found", status=404)
             
-            resource['_id'] = str(resource['_id'])
-            if 'created_at' in resource:
-                resource['created_at'] = resource['created_at'].isoformat()
-            if 'updated_at' in resource:
-                resource['updated_at'] = resource['updated_at'].isoformat()
-            
             return format_response(data=resource, status=200)
             
         except Exception as e:
             return format_response(error=f"Failed to fetch resource: {str(e)}", status=400)
     
+    def get_resources_by_ids(self, resource_ids, fields=None):
+        """Fetch several resources with one $in query, in request order, reporting ids not found"""
+        try:
+            if not isinstance(resource_ids, list) or not resource_ids:
+                return format_response(error="ids must be a non-empty list", status=400)
+            if len(resource_ids) > BATCH_GET_MAX_IDS:
+                return format_response(error=f"At most {BATCH_GET_MAX_IDS} ids per request", status=400)
+            try:
+                projection = parse_projection(fields, RESOURCE_PROJECTABLE_FIELDS)
+            except ValueError as e:
+                return format_response(error=str(e), status=400)
+            
+            # Valid ids are canonicalized (lowercase hex) so they match the stored _id;
+            # duplicates are returned once, at their first position
+            requested = []
+            invalid = []
+            for resource_id in resource_ids:
+                resource_id = str(resource_id)
+                if ObjectId.is_valid(resource_id):
+                    requested.append(str(ObjectId(resource_id)))
+                else:
+                    invalid.append(resource_id)
+            requested = list(dict.fromkeys(requested))
+            invalid = list(dict.fromkeys(invalid))
+            
+            found = {}
+            if requested:
+                object_ids = [ObjectId(resource_id) for resource_id in requested]
+                for resource in db[RESOURCES_COLLECTION].find({'_id': {'$in': object_ids}}, projection or SEARCH_SHADOW_EXCLUSION):
+                    found[str(resource['_id'])] = resource
+            
+            resources = [found[resource_id] for resource_id in requested if resource_id in found]
+            missing = [resource_id for resource_id in requested if resource_id not in found]
+            
+            return format_response(
+                data={'resources': resources, 'missing': missing, 'invalid': invalid},
+                status=200
+            )
+            
+        except Exception as e:
+            return format_response(error=f"Failed to fetch resources: {str(e)}", status=400)
+    
     
     def delete_resource(self, resource_id):
         """Delete a resource"""
@@ -607,16 +1003,141 @@ class ResourceService:
             if not ObjectId.is_valid(resource_id):
                 return format_response(error="Invalid resource ID", status=400)
             
-            result = db[RESOURCES_COLLECTION].delete_one({'_id': ObjectId(resource_id)})
+            deleted = db[RESOURCES_COLLECTION].find_one_and_delete({'_id': ObjectId(resource_id)})
+            generation = resource_generation.bump()
             
-            if result.deleted_count == 0:
+            if deleted is None:
                 return format_response(error="Resource not found", status=404)
+            resource_suggestions.remove([deleted], generation)
             
             return format_response(message="Resource deleted successfully", status=200)
             
         except Exception as e:
             return format_response(error=f"Failed to delete resource: {str(e)}", status=400)
     
+    def bulk_resources(self, operations, request):
+        """Run mixed insert/update/delete operations with one unordered bulk_write.
+
+        Each operation is {'op': 'insert', 'data': {...}}, {'op': 'update', 'id': ..., 'data': {...}}
+        or {'op': 'delete', 'id': ...}. Invalid operations are reported and skipped; the rest run
+        in no particular order, and one failing does not stop the others.
+        """
+        try:
+            if not isinstance(operations, list) or not operations:
+                return format_response(error="operations must be a non-empty list", status=400)
+            if len(operations) > BULK_MAX_OPERATIONS:
+                return format_response(error=f"At most {BULK_MAX_OPERATIONS} operations per request", status=400)
+            
+            user_data = get_current_user(request)
+            if not user_data:
+                return format_response(error="Invalid session", status=401)
+            
+            results = [{'index': index, 'op': None, 'id': None, 'status': 'ok'} for index in range(len(operations))]
+            
+            def fail(index, message):
+                results[index]['status'] = 'error'
+                results[index]['error'] = message
+            
+            # Validate everything first; targets of updates/deletes are read in one query below
+            planned = []
+            targeted = set()
+            for index, operation in enumerate(operations):
+                op = operation.get('op') if isinstance(operation, dict) else None
+                results[index]['op'] = op
+                if op not in BULK_OPERATIONS:
+                    fail(index, f"op must be one of: {', '.join(BULK_OPERATIONS)}")
+                    continue
+                
+                data = operation.get('data') or {}
+                if not isinstance(data, dict):
+                    fail(index, "data must be an object")
+                    continue
+                try:
+                    if op == BULK_INSERT:
+                        missing = [field for field in RESOURCE_REQUIRED_FIELDS if not data.get(field)]
+                        if missing:
+                            fail(index, f"Missing required field: {missing[0]}")
+                            continue
+                        document = {'_id': ObjectId(), **self._new_resource_document(data, user_data['email'])}
+                        results[index]['id'] = str(document['_id'])
+                        planned.append((index, op, document))
+                        continue
+                    
+                    resource_id = str(operation.get('id') or '')
+                    results[index]['id'] = resource_id
+                    if not ObjectId.is_valid(resource_id):
+                        fail(index, "Invalid resource ID")
+                        continue
+                    if resource_id in targeted:
+                        # Unordered, so two operations on one resource would race
+                        fail(index, "Resource already targeted by another operation in this request")
+                        continue
+                    targeted.add(resource_id)
+                    update_data = self._resource_update_fields(data, user_data['email']) if op == BULK_UPDATE else None
+                    planned.append((index, op, (ObjectId(resource_id), update_data)))
+                except (ValueError, TypeError) as e:
+                    fail(index, f"Invalid data format: {str(e)}")
+            
+            # Previous versions feed the suggestion index and tell us which targets do not exist
+            target_ids = [payload[0] for _, op, payload in planned if op != BULK_INSERT]
+            before = {}
+            if target_ids:
+                suggestion_projection = {field: 1 for field in resource_suggestions.fields}
+                for resource in db[RESOURCES_COLLECTION].find({'_id': {'$in': target_ids}}, suggestion_projection):
+                    before[resource['_id']] = resource
+            
+            write_requests = []
+            request_indexes = []
+            for index, op, payload in planned:
+                if op == BULK_INSERT:
+                    write_requests.append(InsertOne(with_search_shadows(payload)))
+                elif payload[0] not in before:
+                    fail(index, "Resource not found")
+                    continue
+                elif op == BULK_UPDATE:
+                    write_requests.append(UpdateOne({'_id': payload[0]}, resource_update(payload[1])))
+                else:
+                    write_requests.append(DeleteOne({'_id': payload[0]}))
+                request_indexes.append(index)
+            
+            if write_requests:
+                try:
+                    db[RESOURCES_COLLECTION].bulk_write(write_requests, ordered=False)
+                except BulkWriteError as e:
+                    for write_error in e.details.get('writeErrors', []):
+                        fail(request_indexes[write_error['index']], write_error.get('errmsg', 'Write failed'))
+                generation = resource_generation.bump()
+                
+                removed, added = [], []
+                for index, op, payload in planned:
+                    if results[index]['status'] != 'ok':
+                        continue
+                    if op == BULK_INSERT:
+                        added.append(payload)
+                    elif op == BULK_UPDATE:
+                        removed.append(before[payload[0]])
+                        added.append({**before[payload[0]], **payload[1]})
+                    else:
+                        removed.append(before[payload[0]])
+                resource_suggestions.replace(removed, added, generation)
+            
+            summary = {op: 0 for op in BULK_OPERATIONS}
+            summary['failed'] = 0
+            for result in results:
+                if result['status'] == 'ok':
+                    summary[result['op']] += 1
+                else:
+                    summary['failed'] += 1
+            
+            return format_response(
+                data={'results': results, 'summary': summary},
+                message=f"{len(operations) - summary['failed']} of {len(operations)} operations applied",
+                status=200
+            )
+            
+        except Exception as e:
+            return format_response(error=f"Bulk operation failed: {str(e)}", status=500)
+    
     
     def dashboard_stats(self):
         """Get dashboard statistics"""
@@ -706,17 +1227,17 @@ class ResourceService:
         except Exception as e:
             return format_response(error=f"Failed to fetch chart data: {str(e)}", status=400)
     
-    def recent_activity(self, limit=10):
+    def recent_activity(self, limit=10, fields=None):
         """Get recent activity"""
         try:
-            recent_resources = list(db[RESOURCES_COLLECTION].find().sort('created_at', -1).limit(limit))
-            
-            for resource in recent_resources:
-                resource['_id'] = str(resource['_id'])
-                if 'created_at' in resource:
-                    resource['created_at'] = resource['created_at'].isoformat()
-                if 'updated_at' in resource:
-                    resource['updated_at'] = resource['updated_at'].isoformat()
+            try:
+                projection = parse_projection(fields, RESOURCE_PROJECTABLE_FIELDS)
+            except ValueError as e:
+                return format_response(error=str(e), status=400)
+
+            recent_resources = list(
+                db[RESOURCES_COLLECTION].find({}, projection or SEARCH_SHADOW_EXCLUSION).sort('created_at', -1).limit(limit)
+            )
             
             return format_response(data=recent_resources, status=200)
             
@@ -1341,7 +1862,7 @@ class AIService:
             context['total_resources'] = total_resources
             context['context_size'] = 'optimized'
             
-            return json.dumps(context, indent=2, default=str)
+            return json_encoding.dumps(context, indent=True)
             
         except Exception as e:
             print(f"Error getting smart context: {e}")
@@ -1454,7 +1975,7 @@ class AIService:
         """Enhanced chat with smart context selection"""
         try:
             message = data.get('message')
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
             
             if db is None:
                 return format_response(error="Database connection not available", status=500)
@@ -1567,7 +2088,7 @@ Note: If you need more specific data that's not in the context, suggest what the
         """Process natural language CRUD instructions using smart context (optimized, not full DB dump)"""
         try:
             instruction = data.get('instruction')
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
 
             if db is None:
                 return format_response(error="Database connection not available", status=500)
@@ -1756,7 +2277,7 @@ Examples:
                 'service_tag': fields['service_tag'],
                 'identification_number': fields['identification_number'],
                 'procurement_date': fields['procurement_date'],
-                'cost': float(fields['cost']),
+                **cost_fields(fields['cost'], strict=True),
                 'location': fields['location'],
                 'department': fields['department'],
                 'created_by': user_data['email'],
@@ -1765,14 +2286,15 @@ Examples:
             }
             
             # Insert resource
-            result = db[RESOURCES_COLLECTION].insert_one(resource_doc)
+            result = db[RESOURCES_COLLECTION].insert_one(with_search_shadows(resource_doc))
+            resource_suggestions.add([resource_doc], resource_generation.bump())
             
             return format_response(
                 data={
                     'resource_id': str(result.inserted_id),
                     'created_resource': resource_doc
                 },
-                message=f"## ✅ Resource Created Successfully\n\n**Resource ID:** {str(result.inserted_id)}\n**Description:** {fields['description']}\n**Department:** {fields['department']}\n**Location:** {fields['location']}\n**Cost:** ₹{fields['cost']:,.2f}",
+                message=f"## ✅ Resource Created Successfully\n\n**Resource ID:** {str(result.inserted_id)}\n**Description:** {fields['description']}\n**Department:** {fields['department']}\n**Location:** {fields['location']}\n**Cost:** ₹{resource_doc['cost']:,.2f}",
                 status=201
             )
             
@@ -1796,7 +2318,7 @@ Examples:
                     query[key] = value
             
             # Get resources
-            resources = list(db[RESOURCES_COLLECTION].find(query).limit(50))
+            resources = list(db[RESOURCES_COLLECTION].find(query, SEARCH_SHADOW_EXCLUSION).limit(50))
             
             # Format resources for display
             formatted_resources = []
@@ -1813,8 +2335,8 @@ Examples:
                     'cost': float(resource.get('cost', 0)),
                     'location': resource.get('location'),
                     'department': resource.get('department'),
-                    'created_at': resource.get('created_at').isoformat() if resource.get('created_at') else None,
-                    'updated_at': resource.get('updated_at').isoformat() if resource.get('updated_at') else None
+                    'created_at': resource.get('created_at'),
+                    'updated_at': resource.get('updated_at')
                 }
                 formatted_resources.append(formatted_resource)
                 total_cost += formatted_resource['cost']
@@ -1868,8 +2390,11 @@ Examples:
             
             # Prepare update data
             update_data = {k: v for k, v in fields.items() if v is not None}
+            update_data.pop('is_cost_valid', None)
+            update_data.pop('cost_raw', None)
+            update_data.pop('import_key', None)
             if 'cost' in update_data:
-                update_data['cost'] = float(update_data['cost'])
+                update_data.update(cost_fields(update_data['cost'], strict=True))
             
             update_data['updated_at'] = datetime.datetime.utcnow()
             update_data['updated_by'] = user_data['email']
@@ -1878,7 +2403,8 @@ Examples:
             resources_to_update = list(db[RESOURCES_COLLECTION].find(query))
             
             # Update resources
-            result = db[RESOURCES_COLLECTION].update_many(query, {'$set': update_data})
+            result = db[RESOURCES_COLLECTION].update_many(query, resource_update(update_data))
+            resource_generation.bump()
             
             # Create detailed message
             message = f"## ✅ Bulk Update Completed\n\n"
@@ -1930,6 +2456,7 @@ Examples:
             
             # Delete resources
             result = db[RESOURCES_COLLECTION].delete_many(query)
+            resource_generation.bump()
             
             # Create detailed message
             message = f"## ⚠️ Bulk Delete Completed\n\n"
@@ -1963,7 +2490,7 @@ Examples:
     def chat_history(self, user_id, page, limit, request):
         """Get chat history with enhanced formatting"""
         try:
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
             
             # If no user_id provided, use current user
             if not user_id:
@@ -1979,10 +2506,6 @@ Examples:
                 {'user_id': user_id}
             ).sort('timestamp', -1).skip(skip).limit(limit))
             
-            for chat in history:
-                chat['_id'] = str(chat['_id'])
-                chat['timestamp'] = chat['timestamp'].isoformat()
-            
             return format_response(data=history, status=200)
             
         except Exception as e:
@@ -2854,6 +3377,8 @@ class FileService:
             'SL No', 'Description', 'Service Tag', 'Identification Number', 
             'Procurement Date', 'Cost', 'Location', 'Department'
         ]
+        # Shadow fields found fully backfilled, see _search_shadows_ready
+        self._ready_shadows = set()
     
     def is_standard_format(self, df):
         """Check if Excel file has standard format"""
@@ -2903,13 +3428,8 @@ class FileService:
                         except:
                             procurement_date = str(row[4])
                     
-                    cost = 0.0
-                    if not pd.isna(row[5]):
-                        try:
-                            cost_str = str(row[5]).replace(',', '').replace('₹', '').strip()
-                            cost = float(cost_str) if cost_str else 0.0
-                        except:
-                            cost = 0.0
+                    # Normalized (and flagged when invalid) on insert
+                    cost = None if pd.isna(row[5]) else row[5]
                     
                     location = str(row[6]).strip() if not pd.isna(row[6]) else (last_location or "")
                     
@@ -2917,6 +3437,9 @@ class FileService:
                     if not pd.isna(row[6]) and str(row[6]).strip(): last_location = str(row[6]).strip()
                     
                     cleaned_entry = {
+                        # Cells as read, before placeholders; upsert imports key on these
+                        'Source Service Tag': service_tag,
+                        'Source Identification Number': identification_no,
                         'SL No': sl_no_counter,
                         'Description': description or f"Item {sl_no_counter}",
                         'Service Tag': service_tag or f"ST-{sl_no_counter}",
@@ -2936,13 +3459,27 @@ class FileService:
             print(f"Error in complex Excel cleaning: {e}")
             return pd.DataFrame()
     
-    def upload_excel(self, file, request, parent_department):
+    def _check_import_options(self, import_mode, import_key):
+        """Resolve the import mode and key, defaulting to the configured ones; raises ValueError"""
+        import_mode = (import_mode or UPLOAD_IMPORT_MODE).lower()
+        import_key = (import_key or UPLOAD_IMPORT_KEY).lower()
+        if import_mode not in IMPORT_MODES:
+            raise ValueError(f"Invalid import_mode, expected one of: {', '.join(IMPORT_MODES)}")
+        if import_key not in IMPORT_KEYS:
+            raise ValueError(f"Invalid import_key, expected one of: {', '.join(IMPORT_KEYS)}")
+        return import_mode, import_key
+
+    def upload_excel(self, file, request, parent_department, import_mode=None, import_key=None):
         """Handle Excel upload, check format, and assign parent department."""
         try:
             if not file or not file.filename.endswith(('.xlsx', '.xls')):
                 return format_response(error="File must be Excel format", status=400)
+            try:
+                import_mode, import_key = self._check_import_options(import_mode, import_key)
+            except ValueError as e:
+                return format_response(error=str(e), status=400)
 
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
             if not user_data:
                 return format_response(error="Authentication required", status=401)
             
@@ -2951,20 +3488,20 @@ class FileService:
             if self.is_standard_format(df):
                 print("Detected standard format Excel")
                 df_with_header = pd.read_excel(file)
-                return self.process_standard_excel(df_with_header, user_data, parent_department)
+                return self.process_standard_excel(df_with_header, user_data, parent_department, import_mode, import_key)
             else:
                 print("Detected complex format Excel - applying cleaner logic")
                 cleaned_df = self.clean_complex_excel(df, parent_department)
                 if cleaned_df.empty:
                     return format_response(error="Failed to clean Excel data", status=400)
-                return self.process_cleaned_excel(cleaned_df, user_data)
+                return self.process_cleaned_excel(cleaned_df, user_data, import_mode, import_key)
         except Exception as e:
             print(f"Excel upload error: {e}")
             return format_response(error=f"Excel upload failed: {str(e)}", status=500)
     
-    def process_standard_excel(self, df, user_data, parent_department_from_user):
+    def process_standard_excel(self, df, user_data, parent_department_from_user, import_mode=IMPORT_MODE_INSERT, import_key=UPLOAD_IMPORT_KEY):
         """Process standard format Excel and assign parent department."""
-        success_count, error_count, errors = 0, 0, []
+        documents, errors = [], []
         for index, row in df.iterrows():
             try:
                 resource_doc = {
@@ -2973,7 +3510,7 @@ class FileService:
                     'service_tag': str(row.get('Service Tag', f'ST-{index + 1}')),
                     'identification_number': str(row.get('Identification Number', f'ID-{index + 1}')),
                     'procurement_date': str(row.get('Procurement Date', '2024-01-01')),
-                    'cost': float(str(row.get('Cost', 0)).replace(',', '').replace('₹', '') or 0),
+                    **cost_fields(row.get('Cost')),
                     'location': str(row.get('Location', 'General Location')),
                     'department': str(row.get('Department', 'Unspecified')),  # From file
                     'parent_department': parent_department_from_user,  # From user
@@ -2981,22 +3518,20 @@ class FileService:
                     'created_at': datetime.datetime.utcnow(),
                     'updated_at': datetime.datetime.utcnow()
                 }
-                db[RESOURCES_COLLECTION].insert_one(resource_doc)
-                success_count += 1
+                # A missing column gets a placeholder above, which must not act as a natural key
+                key_source = {**resource_doc, **{
+                    field: str(row[column]) if column in row else ''
+                    for field, column in (('service_tag', 'Service Tag'), ('identification_number', 'Identification Number'))
+                }}
+                documents.append((f"Row {index + 2}", resource_doc, key_source))
             except Exception as e:
-                error_count += 1
                 errors.append(f"Row {index + 2}: {str(e)}")
         
-        return format_response(data={
-            'success_count': success_count,
-            'error_count': error_count,
-            'errors': errors[:10],
-            'format_type': 'standard'
-        }, status=200)
+        return self._import_response(documents, errors, user_data, import_mode, import_key, {'format_type': 'standard'})
 
-    def process_cleaned_excel(self, cleaned_df, user_data):
+    def process_cleaned_excel(self, cleaned_df, user_data, import_mode=IMPORT_MODE_INSERT, import_key=UPLOAD_IMPORT_KEY):
         """Process DataFrame from cleaned complex Excel."""
-        success_count, error_count, errors = 0, 0, []
+        documents, errors = [], []
         for index, row in cleaned_df.iterrows():
             try:
                 resource_doc = {
@@ -3005,7 +3540,7 @@ class FileService:
                     'service_tag': str(row['Service Tag']),
                     'identification_number': str(row['Identification Number']),
                     'procurement_date': str(row['Procurement Date']),
-                    'cost': float(row['Cost'] or 0.0),
+                    **cost_fields(row['Cost']),
                     'location': str(row['Location']),
                     'department': str(row['Department']),  # From file (via cleaning)
                     'parent_department': str(row['Parent Department']),  # From user (via cleaning)
@@ -3013,26 +3548,29 @@ class FileService:
                     'created_at': datetime.datetime.utcnow(),
                     'updated_at': datetime.datetime.utcnow()
                 }
-                db[RESOURCES_COLLECTION].insert_one(resource_doc)
-                success_count += 1
+                # Blank cells were filled with per-file placeholders like 'ID-1', which must not act as natural keys
+                key_source = {
+                    **resource_doc,
+                    'service_tag': str(row.get('Source Service Tag', resource_doc['service_tag'])),
+                    'identification_number': str(row.get('Source Identification Number', resource_doc['identification_number']))
+                }
+                documents.append((f"Row {index + 1}", resource_doc, key_source))
             except Exception as e:
-                error_count += 1
                 errors.append(f"Row {index + 1}: {str(e)}")
                 
-        return format_response(data={
-            'success_count': success_count,
-            'error_count': error_count,
-            'errors': errors[:10],
-            'format_type': 'cleaned_complex'
-        }, status=200)
+        return self._import_response(documents, errors, user_data, import_mode, import_key, {'format_type': 'cleaned_complex'})
 
-    def upload_csv(self, file, request, parent_department_from_user):
+    def upload_csv(self, file, request, parent_department_from_user, import_mode=None, import_key=None):
         """Process CSV file, preserving file's department and adding parent department."""
         try:
             if not file.filename.endswith('.csv'):
                 return format_response(error="File must be CSV format", status=400)
+            try:
+                import_mode, import_key = self._check_import_options(import_mode, import_key)
+            except ValueError as e:
+                return format_response(error=str(e), status=400)
             
-            user_data = get_user_from_token(request)
+            user_data = get_current_user(request)
             if not user_data:
                 return format_response(error="Authentication required", status=401)
             
@@ -3041,7 +3579,7 @@ class FileService:
             if missing_columns:
                 return format_response(error=f"Missing columns: {', '.join(missing_columns)}", status=400)
 
-            success_count, error_count, errors = 0, 0, []
+            documents, errors = [], []
             for index, row in df.iterrows():
                 try:
                     resource_doc = {
@@ -3050,7 +3588,7 @@ class FileService:
                         'service_tag': str(row['Service Tag']),
                         'identification_number': str(row['Identification Number']),
                         'procurement_date': str(row['Procurement Date']),
-                        'cost': float(str(row['Cost']).replace(',', '').replace('₹', '') or 0),
+                        **cost_fields(row['Cost']),
                         'location': str(row['Location']),
                         'department': str(row.get('Department', 'Unspecified')),  # From file
                         'parent_department': parent_department_from_user,  # From user
@@ -3058,20 +3596,187 @@ class FileService:
                         'created_at': datetime.datetime.utcnow(),
                         'updated_at': datetime.datetime.utcnow()
                     }
-                    db[RESOURCES_COLLECTION].insert_one(resource_doc)
-                    success_count += 1
+                    documents.append((f"Row {index + 2}", resource_doc, resource_doc))
                 except Exception as e:
-                    error_count += 1
                     errors.append(f"Row {index + 2}: {str(e)}")
             
-            return format_response(data={
-                'success_count': success_count,
-                'error_count': error_count,
-                'errors': errors[:10]
-            }, status=200)
+            return self._import_response(documents, errors, user_data, import_mode, import_key)
         except Exception as e:
             return format_response(error=f"CSV upload failed: {str(e)}", status=500)
-    
+
+    def _import_response(self, documents, errors, user_data, import_mode, import_key, extra=None):
+        """Store the (row label, document, key source) entries of an upload and summarize the outcome.
+
+        The key source holds the row's values as read from the file, before any placeholders were filled
+        in; upsert imports take the natural key from it.
+        """
+        if import_mode == IMPORT_MODE_UPSERT:
+            lookup_shadow = SEARCH_SHADOW_FIELDS[IMPORT_KEYS[import_key][0]]
+            if not self._search_shadows_ready(lookup_shadow):
+                return format_response(
+                    error="Upsert imports need the search shadow backfill: run `python migrations.py search-shadows` first",
+                    status=400
+                )
+            summary = self._upsert_documents(documents, user_data, import_key, errors)
+            success_count = summary['inserted_count'] + summary['updated_count'] + summary['unchanged_count']
+        else:
+            summary = {}
+            inserted = []
+            for label, resource_doc, _ in documents:
+                try:
+                    db[RESOURCES_COLLECTION].insert_one(with_search_shadows(resource_doc))
+                    inserted.append(resource_doc)
+                except Exception as e:
+                    errors.append(f"{label}: {str(e)}")
+            if inserted:
+                resource_suggestions.add(inserted, resource_generation.bump())
+            success_count = len(inserted)
+        
+        return format_response(data={
+            'success_count': success_count,
+            'error_count': len(errors),
+            'errors': errors[:10],
+            'import_mode': import_mode,
+            **summary,
+            **(extra or {})
+        }, status=200)
+
+    def _search_shadows_ready(self, shadow_field):
+        """Whether every resource has a trimmed shadow_field, which upsert imports match legacy resources on"""
+        if shadow_field in self._ready_shadows:
+            return True
+        # Scans the shadow index once; everything written after it passes is trimmed already
+        if db[RESOURCES_COLLECTION].find_one({'$or': search_shadow_pending(shadow_field)}, {'_id': 1}) is not None:
+            return False
+        self._ready_shadows.add(shadow_field)
+        return True
+
+    def _upsert_documents(self, documents, user_data, import_key, errors):
+        """Upsert upload rows by their natural key in batches of IMPORT_BATCH_SIZE.
+
+        A row matches the resource carrying its import_key or, failing that, any resource with the same
+        natural key (an insert-mode upload, or one keyed differently), which then adopts the key. Matching resources are
+        updated only when a field differs; new keys are inserted with UpdateOne(upsert=True), so a
+        concurrent import of the same sheet updates instead of duplicating. Rows without a key (including
+        a placeholder filled in for an empty cell), or repeating a key seen earlier in the file, are conflicts.
+        """
+        summary = {'import_key': import_key, 'inserted_count': 0, 'updated_count': 0, 'unchanged_count': 0, 'conflict_count': 0}
+        conflicts = []
+        key_fields = IMPORT_KEYS[import_key]
+        lookup_shadow = SEARCH_SHADOW_FIELDS[key_fields[0]]
+        
+        def conflict(label, message):
+            summary['conflict_count'] += 1
+            conflicts.append(f"{label}: {message}")
+        
+        # Keys in file order; later rows repeating a key are conflicts
+        keyed = {}
+        for label, resource_doc, key_source in documents:
+            key = resource_import_key(import_key, key_source)
+            if key is None:
+                conflict(label, f"missing {' / '.join(key_fields)}")
+            elif key in keyed:
+                conflict(label, f"same {' / '.join(key_fields)} as {keyed[key][0]}")
+            else:
+                keyed[key] = (label, resource_doc)
+        
+        removed, added = [], []
+        raced = False
+        rows = list(keyed.items())
+        for offset in range(0, len(rows), IMPORT_BATCH_SIZE):
+            batch = rows[offset:offset + IMPORT_BATCH_SIZE]
+            keys = [key for key, _ in batch]
+            
+            # Resources already imported under these keys, and others with the same natural key
+            existing = {}
+            # Normalized like the shadow field, so padded or differently cased cells still match
+            natural_values = list({search_shadow_value(row[1].get(key_fields[0])) for _, row in batch})
+            for resource in db[RESOURCES_COLLECTION].find({'$or': [
+                {'import_key': {'$in': keys}},
+                {lookup_shadow: {'$in': natural_values}}
+            ]}, SEARCH_SHADOW_EXCLUSION):
+                key = resource_import_key(import_key, resource)
+                if resource.get('import_key') in keyed:
+                    key = resource['import_key']
+                if key in keyed and (key not in existing or resource.get('import_key') == key):
+                    existing[key] = resource
+            
+            now = datetime.datetime.utcnow()
+            write_requests, planned = [], []
+            for key, (label, resource_doc) in batch:
+                fields = {field: value for field, value in resource_doc.items() if field not in ('created_by', 'created_at', 'updated_at')}
+                before = existing.get(key)
+                if before is not None:
+                    changed = any(before.get(field) != value for field, value in fields.items())
+                    if changed:
+                        update_fields = {**fields, 'import_key': key, 'updated_at': now, 'updated_by': user_data['email']}
+                        update = {'$set': with_search_shadows(update_fields)}
+                        if stale_cost_raw(update_fields):
+                            update['$unset'] = stale_cost_raw(update_fields)
+                        write_requests.append(UpdateOne({'_id': before['_id']}, update))
+                        planned.append((label, before, {**before, **update_fields}))
+                    elif before.get('import_key') != key:
+                        # Unchanged, but adopts the key; counted once the write succeeds
+                        write_requests.append(UpdateOne({'_id': before['_id']}, {'$set': {'import_key': key}}))
+                        planned.append((label, None, None))
+                    else:
+                        summary['unchanged_count'] += 1
+                    continue
+                
+                write_requests.append(UpdateOne(
+                    {'import_key': key},
+                    {
+                        '$set': with_search_shadows({**fields, 'import_key': key, 'updated_at': now}),
+                        '$setOnInsert': {'created_by': resource_doc['created_by'], 'created_at': resource_doc['created_at']},
+                        # A resource inserted concurrently under the key may carry one
+                        **({'$unset': stale_cost_raw(fields)} if stale_cost_raw(fields) else {})
+                    },
+                    upsert=True
+                ))
+                planned.append((label, False, {**resource_doc, 'import_key': key}))
+            
+            if not write_requests:
+                continue
+            failed = set()
+            upserted = set()
+            try:
+                result = db[RESOURCES_COLLECTION].bulk_write(write_requests, ordered=False)
+                upserted = set(result.upserted_ids)
+            except BulkWriteError as e:
+                upserted = {upsert['index'] for upsert in e.details.get('upserted', [])}
+                for write_error in e.details.get('writeErrors', []):
+                    failed.add(write_error['index'])
+                    label = planned[write_error['index']][0]
+                    if write_error.get('code') == 11000:
+                        # Another import claimed the key between our lookup and write
+                        conflict(label, "key written concurrently by another import")
+                    else:
+                        errors.append(f"{label}: {write_error.get('errmsg', 'Write failed')}")
+            
+            for index, (label, before, after) in enumerate(planned):
+                if index in failed:
+                    continue
+                if after is None:
+                    summary['unchanged_count'] += 1
+                elif index in upserted:
+                    summary['inserted_count'] += 1
+                    added.append(after)
+                else:
+                    summary['updated_count'] += 1
+                    if before is False:
+                        # The upsert found a resource inserted concurrently, whose previous values we never read
+                        raced = True
+                    else:
+                        removed.append(before)
+                        added.append(after)
+        
+        if summary['inserted_count'] or summary['updated_count']:
+            generation = resource_generation.bump()
+            if not raced:
+                # Otherwise the suggestion index sees the generation gap and rebuilds
+                resource_suggestions.replace(removed, added, generation)
+        summary['conflicts'] = conflicts[:10]
+        return summary
 
     def export_csv(self, filters):
         """Export resources to CSV"""
@@ -3084,15 +3789,12 @@ class FileService:
                 query['department'] = {'$regex': filters['department'], '$options': 'i'}
             
             # Get resources
-            resources = list(db[RESOURCES_COLLECTION].find(query))
+            resources = list(db[RESOURCES_COLLECTION].find(query, SEARCH_SHADOW_EXCLUSION))
             if not resources:
                 return format_response(error="No data found", status=404)
             
             # Convert to DataFrame
-            df = pd.DataFrame(resources)
-            
-            # Remove MongoDB-specific fields
-            df.drop(columns=['_id', 'created_at', 'updated_at', 'created_by'], inplace=True, errors='ignore')
+            df = export_dataframe(resources)
             
             # Rename columns to match CSV format
             column_mapping = {
@@ -3137,15 +3839,12 @@ class FileService:
                 query['department'] = {'$regex': filters['department'], '$options': 'i'}
             
             # Get resources
-            resources = list(db[RESOURCES_COLLECTION].find(query))
+            resources = list(db[RESOURCES_COLLECTION].find(query, SEARCH_SHADOW_EXCLUSION))
             if not resources:
                 return format_response(error="No data found", status=404)
             
             # Convert to DataFrame
-            df = pd.DataFrame(resources)
-            
-            # Remove MongoDB-specific fields
-            df.drop(columns=['_id', 'created_at', 'updated_at', 'created_by'], inplace=True, errors='ignore')
+            df = export_dataframe(resources)
             
             # Rename columns to match Excel format
             column_mapping = {
@@ -3175,4 +3874,4 @@ class FileService:
             )
             
         except Exception as e:
-            return format_response(error=f"Excel export failed: {str(e)}", status=500)
\ No newline at end of file
+            return format_response(error=f"Excel export failed: {str(e)}", status=500)
\ No newline at end of file
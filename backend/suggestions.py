@@ -0,0 +1,195 @@
+import time
+import bisect
+import threading
+
+from config import db, RESOURCES_COLLECTION, SUGGEST_FIELDS, SUGGEST_REBUILD_MIN_SECONDS
+from write_generation import resource_generation
+
+# Up to this many keys per write are inserted/removed one at a time (a memmove each);
+# larger batches (uploads, bulk) are merged into the sorted array in a single pass
+INCREMENTAL_KEY_LIMIT = 64
+
+class SuggestionIndex:
+    """In-memory prefix index over resource values for typeahead, kept as a sorted array.
+
+    Writes in this process are applied incrementally. When the resources write generation shows
+    a write this process did not apply (another worker, a bulk change), the index is rebuilt in
+    the background while the previous one keeps serving, at most once every rebuild_min_seconds.
+    """
+
+    def __init__(self, fields=SUGGEST_FIELDS, database=None, rebuild_min_seconds=SUGGEST_REBUILD_MIN_SECONDS):
+        self.fields = fields
+        self.database = database if database is not None else db
+        self.rebuild_min_seconds = rebuild_min_seconds
+        self._keys = []
+        self._counts = {}
+        self._generation = None
+        self._rebuilt_at = float('-inf')
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def suggest(self, prefix, limit=10):
+        """Distinct values starting with prefix (descriptions also match at any word)"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self._ensure_fresh()
+
+        suggestions = []
+        seen = set()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(suggestions) < limit:
+                key, field, value = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if (field, value) not in seen:
+                    seen.add((field, value))
+                    suggestions.append({'value': value, 'field': field})
+                position += 1
+        return suggestions
+
+    def add(self, resources, generation):
+        """Apply newly written resources"""
+        self._apply([], resources, generation)
+
+    def remove(self, resources, generation):
+        """Apply deleted resources"""
+        self._apply(resources, [], generation)
+
+    def replace(self, before, after, generation):
+        """Apply updated resources, given their documents before and after the write"""
+        self._apply(before, after, generation)
+
+    def rebuild(self):
+        """Rebuild from the collection; returns the number of distinct values indexed"""
+        # Read the generation first, so writes racing the scan trigger another rebuild
+        generation = resource_generation.current()
+        self._rebuilt_at = time.monotonic()
+        counts = {}
+        projection = {field: 1 for field in self.fields}
+        for resource in self.database[RESOURCES_COLLECTION].find({}, projection).batch_size(5000):
+            for entry in self._entries(resource):
+                counts[entry] = counts.get(entry, 0) + 1
+
+        keys = sorted(key for entry in counts for key in self._keys_for(entry))
+        with self._lock:
+            self._counts = counts
+            self._keys = keys
+            self._generation = generation
+        return len(counts)
+
+    def _ensure_fresh(self):
+        if self.database is None:
+            return
+        if self._generation is None:
+            # First use; unless the startup warm-up is already on it, build now
+            if not self._rebuilding:
+                self.rebuild()
+        elif resource_generation.current() != self._generation:
+            # Writes within rebuild_min_seconds of the last rebuild wait and share the next one
+            delay = self._rebuilt_at + self.rebuild_min_seconds - time.monotonic()
+            self.rebuild_in_background(delay=max(delay, 0))
+
+    def rebuild_in_background(self, delay=0):
+        """Rebuild on a background thread after delay seconds, unless a rebuild is already pending"""
+        if self.database is None:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                if delay:
+                    time.sleep(delay)
+                self.rebuild()
+            except Exception as e:
+                print(f"❌ Suggestion index rebuild failed: {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name='suggestion-rebuild', daemon=True).start()
+
+    def _apply(self, removed, added, generation):
+        with self._lock:
+            if self._generation is None:
+                # Not built yet; the first suggest() reads everything anyway
+                return
+            # Entries whose count drops to zero, and entries seen for the first time
+            vanished = set()
+            appeared = set()
+            for resource in removed:
+                for entry in self._entries(resource):
+                    count = self._counts.get(entry, 0)
+                    if count > 1:
+                        self._counts[entry] = count - 1
+                    elif count == 1:
+                        del self._counts[entry]
+                        vanished.add(entry)
+            for resource in added:
+                for entry in self._entries(resource):
+                    count = self._counts.get(entry, 0)
+                    self._counts[entry] = count + 1
+                    if count == 0:
+                        if entry in vanished:
+                            # Removed and re-added by this write, its keys are still there
+                            vanished.discard(entry)
+                        else:
+                            appeared.add(entry)
+            self._update_keys(
+                [key for entry in vanished for key in self._keys_for(entry)],
+                [key for entry in appeared for key in self._keys_for(entry)]
+            )
+
+            # Only our own write happened since the last sync if the counter moved by exactly one;
+            # otherwise stay behind so the next suggest() sees the gap and rebuilds
+            if generation == self._generation + 1:
+                self._generation = generation
+
+    def _update_keys(self, removed_keys, added_keys):
+        """Remove and insert sorted-array keys; the caller holds the lock"""
+        if len(removed_keys) + len(added_keys) <= INCREMENTAL_KEY_LIMIT:
+            for key in removed_keys:
+                position = bisect.bisect_left(self._keys, key)
+                if position < len(self._keys) and self._keys[position] == key:
+                    del self._keys[position]
+            for key in added_keys:
+                bisect.insort(self._keys, key)
+            return
+
+        keys = self._keys
+        if removed_keys:
+            removed_keys = set(removed_keys)
+            keys = [key for key in keys if key not in removed_keys]
+        if added_keys:
+            # Two sorted runs, which sort() merges in linear time
+            keys = keys + sorted(added_keys)
+            keys.sort()
+        self._keys = keys
+
+    def _entries(self, resource):
+        """(field, value) pairs a resource contributes"""
+        for field in self.fields:
+            value = resource.get(field)
+            if value is not None and str(value).strip():
+                yield field, str(value).strip()
+
+    def _keys_for(self, entry):
+        """Sorted-array keys for a (field, value) pair"""
+        field, value = entry
+        lowered = value.lower()
+        if field != 'description':
+            return [(lowered, field, value)]
+
+        # Descriptions match from the start of each word, e.g. 'mon' finds 'Dell Monitor'
+        keys = []
+        offset = 0
+        for word in lowered.split(' '):
+            if word:
+                keys.append((lowered[offset:], field, value))
+            offset += len(word) + 1
+        return keys
+
+resource_suggestions = SuggestionIndex()
@@ -0,0 +1,61 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+mongomock = pytest.importorskip('mongomock')
+
+import services
+from config import IMPORT_MODE_UPSERT, RESOURCES_COLLECTION
+from json_encoding import FastJSONProvider
+
+USER = {'email': 'admin@example.com'}
+
+def complex_sheet(department, descriptions):
+    """Raw complex-format sheet (read with header=None): a department row, then numbered rows with blank ids"""
+    rows = [[department] + [np.nan] * 6]
+    for number, description in enumerate(descriptions, 1):
+        rows.append([number, description, np.nan, np.nan, '2024-01-01', 1000, 'Lab 1'])
+    return pd.DataFrame(rows)
+
+@pytest.fixture
+def file_service(monkeypatch):
+    database = mongomock.MongoClient().db
+    monkeypatch.setattr(services, 'db', database)
+    monkeypatch.setattr(services.resource_suggestions, 'database', None)
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    with app.app_context():
+        yield services.FileService(), database[RESOURCES_COLLECTION]
+
+def upload(file_service, sheet, parent_department):
+    cleaned = file_service.clean_complex_excel(sheet, parent_department)
+    response, status = file_service.process_cleaned_excel(cleaned, USER, IMPORT_MODE_UPSERT, 'identification_number')
+    assert status == 200
+    return response.get_json()['data']
+
+def test_blank_ids_from_different_sheets_do_not_match(file_service):
+    service, resources = file_service
+    # What an insert-mode upload of another department's sheet left behind: placeholder ids from its own row numbers
+    existing = services.with_search_shadows({
+        'sl_no': '1', 'description': 'Oscilloscope', 'service_tag': 'ST-1', 'identification_number': 'ID-1',
+        'procurement_date': '2024-01-01', 'cost': 45000.0, 'is_cost_valid': True, 'location': 'Lab 2',
+        'department': 'ECE', 'parent_department': 'Electronics',
+        'created_by': USER['email'], 'created_at': datetime.datetime(2024, 1, 1), 'updated_at': datetime.datetime(2024, 1, 1)
+    })
+    existing['_id'] = resources.insert_one(dict(existing)).inserted_id
+
+    first = upload(service, complex_sheet('CSE', ['Desktop', 'Monitor']), 'Computing')
+    second = upload(service, complex_sheet('MECH', ['Lathe']), 'Mechanical')
+
+    for summary in (first, second):
+        assert summary['inserted_count'] == summary['updated_count'] == summary['unchanged_count'] == 0
+        assert all('missing identification_number' in conflict for conflict in summary['conflicts'])
+    assert first['conflict_count'] == 2
+    assert second['conflict_count'] == 1
+
+    stored = resources.find_one({'_id': existing['_id']})
+    assert stored == existing
+    assert resources.count_documents({}) == 1
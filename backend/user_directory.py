@@ -0,0 +1,59 @@
+from config import db, USERS_COLLECTION, USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_SIZE
+from cache import TTLCache
+
+class UserDirectory:
+    """Read-through cache of user documents keyed by firebase_uid and by email.
+
+    Writes made through update()/put() are reflected immediately in this process;
+    other worker processes see them once their entry expires (USER_CACHE_TTL_SECONDS).
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL_SECONDS, max_size=USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self._cache = TTLCache(max_size=max_size)
+
+    def get_by_uid(self, uid):
+        return self._get('uid', uid, {'firebase_uid': uid})
+
+    def get_by_email(self, email):
+        return self._get('email', email, {'email': email})
+
+    def put(self, user):
+        """Cache a user document under both of its keys"""
+        if self.ttl <= 0 or not user:
+            return
+        if user.get('firebase_uid'):
+            self._cache.set(('uid', user['firebase_uid']), dict(user), self.ttl)
+        if user.get('email'):
+            self._cache.set(('email', user['email']), dict(user), self.ttl)
+
+    def update(self, user, fields):
+        """Write fields to the user's document and through to the cache"""
+        db[USERS_COLLECTION].update_one({'_id': user['_id']}, {'$set': fields})
+
+        # Keys may change (e.g. firebase_uid), so drop the old entries first
+        self.invalidate(user)
+        updated = {**user, **fields}
+        self.put(updated)
+        return updated
+
+    def invalidate(self, user):
+        if user.get('firebase_uid'):
+            self._cache.pop(('uid', user['firebase_uid']))
+        if user.get('email'):
+            self._cache.pop(('email', user['email']))
+
+    def _get(self, key_type, value, query):
+        if not value:
+            return None
+
+        cached = self._cache.get((key_type, value))
+        if cached is not None:
+            return dict(cached)
+
+        user = db[USERS_COLLECTION].find_one(query)
+        if user:
+            self.put(user)
+        return user
+
+user_directory = UserDirectory()
@@ -1,10 +1,38 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g, make_response
 import re
 import jwt
-from datetime import datetime
+import json
+import math
+import time
+import numbers
+import base64
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
 
-from config import JWT_SECRET, ADMIN_ROLE, VIEWER_ROLE, db, SESSIONS_COLLECTION
+from config import (
+    JWT_SECRET, ADMIN_ROLE, VIEWER_ROLE, db, SESSIONS_COLLECTION,
+    SESSION_INVALIDATIONS_COLLECTION, SESSION_CACHE_MAX_SIZE, SESSION_CACHE_SYNC_SECONDS,
+    SESSION_MODE, SESSION_MODE_STATELESS, REVOKED_TOKENS_COLLECTION, REVOCATION_SYNC_SECONDS
+)
+from cache import TTLCache
+
+# Verified sessions keyed by token hash, so authenticated requests skip the sessions lookup
+_session_cache = TTLCache(max_size=SESSION_CACHE_MAX_SIZE)
+_session_invalidation_hooks = []
+_session_sync_lock = threading.Lock()
+_session_sync_state = {'last_sync': datetime.utcnow(), 'next_sync_at': 0.0}
+
+# Revoked token IDs (jti -> token expiry) used by the stateless session mode
+_revoked_jtis = {}
+_revocation_sync_lock = threading.Lock()
+_revocation_sync_state = {'last_sync': None, 'next_sync_at': 0.0}
+
+# key -> (last print time, messages suppressed since)
+_rate_limited_logs = {}
+_rate_limited_logs_lock = threading.Lock()
 
 def validate_email(email):
     """Validate email format"""
@@ -32,6 +60,20 @@ def format_response(data=None, message=None, error=None, status=200):
     
     return jsonify(response), status
 
+def log_rate_limited(key, message, interval_seconds=60):
+    """Print at most one message per key per interval, noting how many were suppressed"""
+    now = time.monotonic()
+    with _rate_limited_logs_lock:
+        last_printed, suppressed = _rate_limited_logs.get(key, (None, 0))
+        if last_printed is not None and now - last_printed < interval_seconds:
+            _rate_limited_logs[key] = (last_printed, suppressed + 1)
+            return
+        _rate_limited_logs[key] = (now, 0)
+    
+    if suppressed:
+        message = f"{message} suppressed={suppressed}"
+    print(message)
+
 def validate_request_data(data, required_fields):
     """Validate required fields in request data"""
     if not data:
@@ -50,6 +92,139 @@ def validate_request_data(data, required_fields):
     
     return None
 
+def hash_token(token):
+    """Return the SHA-256 hex digest used to key cached sessions"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def register_session_invalidation_hook(hook):
+    """Register a callable(token_hash) run whenever a session is invalidated"""
+    _session_invalidation_hooks.append(hook)
+
+def invalidate_cached_session(token):
+    """Evict a session from this process' cache and notify the other workers"""
+    token_hash = hash_token(token)
+    _session_cache.pop(token_hash)
+    
+    for hook in _session_invalidation_hooks:
+        try:
+            hook(token_hash)
+        except Exception as e:
+            print(f"Session invalidation hook failed: {e}")
+
+def publish_session_invalidation(token_hash):
+    """Record an invalidation so other worker processes evict the session too"""
+    if db is None:
+        return
+    
+    db[SESSION_INVALIDATIONS_COLLECTION].insert_one({
+        'token_hash': token_hash,
+        'created_at': datetime.utcnow()
+    })
+
+def sync_session_invalidations():
+    """Evict sessions invalidated by other workers, at most once per sync interval"""
+    if db is None or SESSION_CACHE_SYNC_SECONDS <= 0:
+        return
+    
+    now = time.monotonic()
+    if now < _session_sync_state['next_sync_at'] or not _session_sync_lock.acquire(blocking=False):
+        return
+    
+    try:
+        _session_sync_state['next_sync_at'] = now + SESSION_CACHE_SYNC_SECONDS
+        since = _session_sync_state['last_sync']
+        _session_sync_state['last_sync'] = datetime.utcnow()
+        
+        # Overlap the previous window to tolerate clock skew between workers
+        invalidations = db[SESSION_INVALIDATIONS_COLLECTION].find(
+            {'created_at': {'$gte': since - timedelta(seconds=SESSION_CACHE_SYNC_SECONDS)}},
+            {'token_hash': 1}
+        )
+        for invalidation in invalidations:
+            _session_cache.pop(invalidation['token_hash'])
+    except Exception as e:
+        print(f"Session invalidation sync failed: {e}")
+    finally:
+        _session_sync_lock.release()
+
+register_session_invalidation_hook(publish_session_invalidation)
+
+def revoke_token(jti, expires_at):
+    """Add a token ID to the revocation denylist until the token's own expiry"""
+    _revoked_jtis[jti] = expires_at
+    
+    if db is None:
+        return
+    
+    db[REVOKED_TOKENS_COLLECTION].update_one(
+        {'jti': jti},
+        {'$setOnInsert': {'jti': jti, 'expires_at': expires_at, 'revoked_at': datetime.utcnow()}},
+        upsert=True
+    )
+
+def sync_revoked_tokens(force=False):
+    """Pull revocations made by other workers, at most once per sync interval"""
+    if db is None:
+        return
+    
+    now = time.monotonic()
+    if not force and now < _revocation_sync_state['next_sync_at']:
+        return
+    if not _revocation_sync_lock.acquire(blocking=False):
+        return
+    
+    try:
+        _revocation_sync_state['next_sync_at'] = now + REVOCATION_SYNC_SECONDS
+        since = _revocation_sync_state['last_sync']
+        _revocation_sync_state['last_sync'] = datetime.utcnow()
+        
+        # First sync loads the whole (small) denylist, later ones only the recent revocations
+        query = {}
+        if since is not None:
+            query = {'revoked_at': {'$gte': since - timedelta(seconds=REVOCATION_SYNC_SECONDS)}}
+        
+        for revoked in db[REVOKED_TOKENS_COLLECTION].find(query, {'jti': 1, 'expires_at': 1}):
+            _revoked_jtis[revoked['jti']] = revoked['expires_at']
+        
+        # Drop entries whose tokens have expired on their own
+        utc_now = datetime.utcnow()
+        for jti, expires_at in list(_revoked_jtis.items()):
+            if expires_at < utc_now:
+                _revoked_jtis.pop(jti, None)
+    except Exception as e:
+        print(f"Revocation sync failed: {e}")
+    finally:
+        _revocation_sync_lock.release()
+
+def is_token_revoked(jti):
+    """Check a token ID against the in-memory revocation denylist"""
+    sync_revoked_tokens()
+    return jti in _revoked_jtis
+
+def reap_expired_sessions():
+    """Delete every expired session; returns the number of sessions removed"""
+    if db is None:
+        return 0
+    
+    result = db[SESSIONS_COLLECTION].delete_many({'expires_at': {'$lt': datetime.utcnow()}})
+    return result.deleted_count
+
+def start_session_reaper(interval_seconds):
+    """Run reap_expired_sessions every interval_seconds on a daemon thread"""
+    def run():
+        while True:
+            try:
+                deleted = reap_expired_sessions()
+                if deleted:
+                    print(f"🧹 Reaped {deleted} expired sessions")
+            except Exception as e:
+                print(f"Session reaper error: {e}")
+            time.sleep(interval_seconds)
+    
+    reaper = threading.Thread(target=run, name='session-reaper', daemon=True)
+    reaper.start()
+    return reaper
+
 def get_user_from_token(request):
     """Extract user data from JWT token"""
     try:
@@ -62,28 +237,49 @@ def get_user_from_token(request):
         # Decode JWT token
         decoded_token = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
         
+        # Stateless mode trusts the signature and exp; only the denylist is consulted.
+        # Tokens issued before jti was added still fall back to the session lookup.
+        if SESSION_MODE == SESSION_MODE_STATELESS and decoded_token.get('jti'):
+            if is_token_revoked(decoded_token['jti']):
+                return None
+            return decoded_token
+        
+        # Serve verified sessions from the in-process cache
+        sync_session_invalidations()
+        token_hash = hash_token(token)
+        if _session_cache.get(token_hash):
+            return decoded_token
+        
         # Check if session exists in database
         session = db[SESSIONS_COLLECTION].find_one({'session_token': token})
         if not session:
             return None
         
         # Check if session is expired
-        if session['expires_at'] < datetime.utcnow():
+        now = datetime.utcnow()
+        if session['expires_at'] < now:
             # Remove expired session
             db[SESSIONS_COLLECTION].delete_one({'session_token': token})
             return None
         
+        _session_cache.set(token_hash, True, (session['expires_at'] - now).total_seconds())
         return decoded_token
         
     except Exception as e:
         print(f"Token validation error: {e}")
         return None
 
+def get_current_user(request):
+    """Resolve the authenticated user once per request and reuse it from flask.g"""
+    if '_current_user' not in g:
+        g._current_user = get_user_from_token(request)
+    return g._current_user
+
 def login_required(f):
     """Decorator to require authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_data = get_user_from_token(request)
+        user_data = get_current_user(request)
         if not user_data:
             return format_response(error="Authentication required", status=401)
         
@@ -95,7 +291,7 @@ def admin_required(f):
     """Decorator to require admin role"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_data = get_user_from_token(request)
+        user_data = get_current_user(request)
         if not user_data:
             return format_response(error="Authentication required", status=401)
         
@@ -110,7 +306,7 @@ def viewer_or_admin_required(f):
     """Decorator to require viewer or admin role"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user_data = get_user_from_token(request)
+        user_data = get_current_user(request)
         if not user_data:
             return format_response(error="Authentication required", status=401)
         
@@ -121,6 +317,34 @@ def viewer_or_admin_required(f):
     
     return decorated_function
 
+def generation_etag(generation, request):
+    """Strong ETag for a response derived only from generation and the request path and arguments"""
+    args = sorted(request.args.items(multi=True))
+    key = json.dumps([generation.name, generation.current(), request.path, args], separators=(',', ':'))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def conditional_get(generation):
+    """Decorator answering If-None-Match with 304 while generation is unchanged, before the view runs"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag = generation_etag(generation, request)
+            # Weak comparison, since compression turns the ETag weak
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                # Let clients keep the copy but check back every time
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return decorated_function
+    return decorator
+
 def sanitize_input(input_string):
     """Sanitize user input"""
     if not input_string:
@@ -143,6 +367,57 @@ def paginate_query(query, page, limit):
     skip = (page - 1) * limit
     return query.skip(skip).limit(limit)
 
+def encode_cursor(document):
+    """Opaque keyset cursor pointing just past a (created_at, _id) sorted document"""
+    created_at = document.get('created_at')
+    payload = {
+        'c': created_at.isoformat() if isinstance(created_at, datetime) else None,
+        'i': str(document['_id'])
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor from encode_cursor into (created_at, _id); raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        created_at = datetime.fromisoformat(payload['c']) if payload['c'] is not None else None
+        return created_at, ObjectId(payload['i'])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_query(query, cursor):
+    """Restrict query to documents after the cursor in (created_at desc, _id desc) order"""
+    created_at, last_id = decode_cursor(cursor)
+    if created_at is None:
+        # Documents without created_at sort last, ordered among themselves by _id
+        after = {'created_at': None, '_id': {'$lt': last_id}}
+    else:
+        after = {'$or': [
+            {'created_at': {'$lt': created_at}},
+            {'created_at': created_at, '_id': {'$lt': last_id}},
+            {'created_at': None}
+        ]}
+    return {'$and': [query, after]} if query else after
+
+def parse_projection(fields_param, allowed_fields):
+    """Turn a comma separated fields= parameter (or a list of names) into a Mongo projection; None means every field"""
+    if not fields_param:
+        return None
+
+    if isinstance(fields_param, str):
+        fields_param = fields_param.split(',')
+    elif not isinstance(fields_param, list) or not all(isinstance(field, str) for field in fields_param):
+        raise ValueError("fields must be a comma separated string or a list of field names")
+    fields = [field.strip() for field in fields_param if field.strip()]
+    unknown = [field for field in fields if field not in allowed_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if not fields:
+        return None
+    return {field: 1 for field in fields}
+
 def build_search_query(search_term, fields):
     """Build MongoDB search query"""
     if not search_term:
@@ -156,6 +431,15 @@ def build_search_query(search_term, fields):
     
     return {'$or': search_conditions}
 
+def search_shadow_value(value):
+    """Value stored in a search shadow field (and compared in import keys): trimmed and lowercased"""
+    return str(value or '').strip().lower()
+
+def search_shadow_pending(shadow_field):
+    """$or clauses for documents whose shadow field still needs the search-shadows backfill:
+    missing, or written untrimmed before shadows were trimmed"""
+    return [{shadow_field: {'$exists': False}}, {shadow_field: {'$regex': r'^\s|\s$'}}]
+
 def validate_date_format(date_string):
     """Validate date format (YYYY-MM-DD)"""
     if not date_string:
@@ -175,6 +459,46 @@ def validate_cost(cost_value):
     except (ValueError, TypeError):
         return False
 
+# Currency markers, thousands separators and the trailing '/-' of rupee amounts found in uploaded
+# sheets, e.g. '₹ 45,000', 'Rs. 1,200.50' or '45,000.00/-'
+COST_NOISE_PATTERN = re.compile(r'(?i)₹|rs\.?|inr|/-\s*$|,|\s')
+
+def normalize_cost(value):
+    """(cost, is_cost_valid) for a raw cost value.
+
+    Numbers and numeric strings parse; placeholders like '', '---' or 'N/A', negative and
+    non-finite values, and anything else unparseable become (0.0, False).
+    """
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        cost = float(value)
+    elif isinstance(value, str):
+        try:
+            cost = float(COST_NOISE_PATTERN.sub('', value))
+        except ValueError:
+            return 0.0, False
+    else:
+        return 0.0, False
+
+    if not math.isfinite(cost) or cost < 0:
+        return 0.0, False
+    return cost, True
+
+def cost_fields(value, strict=False):
+    """cost and is_cost_valid fields to store for a raw cost value.
+
+    An invalid non-empty value is also kept as cost_raw, so flagged resources can be fixed by hand.
+    With strict (a cost supplied explicitly through the API), an invalid value raises ValueError instead.
+    """
+    cost, is_cost_valid = normalize_cost(value)
+    if strict and not is_cost_valid:
+        raise ValueError(f"Invalid cost: {value!r}")
+    fields = {'cost': cost, 'is_cost_valid': is_cost_valid}
+    if not is_cost_valid:
+        raw = '' if value is None or (isinstance(value, float) and math.isnan(value)) else str(value).strip()
+        if raw:
+            fields['cost_raw'] = raw
+    return fields
+
 def clean_resource_data(data):
     """Clean and validate resource data"""
     cleaned_data = {}
@@ -0,0 +1,61 @@
+import time
+import threading
+from pymongo import ReturnDocument
+
+from config import db, WRITE_GENERATIONS_COLLECTION, WRITE_GENERATION_SYNC_SECONDS, RESOURCES_COLLECTION
+
+class WriteGeneration:
+    """Counter bumped on every write to a collection, shared by all workers through MongoDB.
+
+    Anything derived from the collection (cached counts, ETags) stays valid while the
+    generation is unchanged. Bumps from this process are seen immediately; bumps from
+    other workers within WRITE_GENERATION_SYNC_SECONDS.
+    """
+
+    def __init__(self, name, sync_seconds=WRITE_GENERATION_SYNC_SECONDS, database=None):
+        self.name = name
+        self.sync_seconds = sync_seconds
+        self.database = database if database is not None else db
+        self._value = 0
+        self._next_sync_at = 0.0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        """Record a write; returns the new generation"""
+        with self._lock:
+            if self.database is None:
+                self._value += 1
+                return self._value
+
+            try:
+                counter = self.database[WRITE_GENERATIONS_COLLECTION].find_one_and_update(
+                    {'_id': self.name},
+                    {'$inc': {'generation': 1}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                self._value = max(self._value + 1, counter['generation'])
+            except Exception as e:
+                print(f"❌ Failed to bump write generation for {self.name}: {e}")
+                # Still move on locally, and re-read the shared value on the next call
+                self._value += 1
+                self._next_sync_at = 0.0
+            return self._value
+
+    def current(self):
+        """Current generation, re-read from MongoDB at most every sync_seconds"""
+        if self.database is None or time.monotonic() < self._next_sync_at:
+            return self._value
+
+        with self._lock:
+            if time.monotonic() >= self._next_sync_at:
+                try:
+                    counter = self.database[WRITE_GENERATIONS_COLLECTION].find_one({'_id': self.name})
+                    if counter:
+                        self._value = max(self._value, counter['generation'])
+                except Exception as e:
+                    print(f"❌ Failed to read write generation for {self.name}: {e}")
+                self._next_sync_at = time.monotonic() + self.sync_seconds
+            return self._value
+
+resource_generation = WriteGeneration(RESOURCES_COLLECTION)